@@ -0,0 +1,53 @@
+"""
+Backfill of the events of several feeds (`sense.backfill.Backfill`) against listing
+them from one process (`feed.events.iter`, `feed.events.to_arrays`), over the local
+mock of the API. The speedup of the worker processes depends on the cpus available.
+"""
+import tempfile
+import shutil
+import multiprocessing
+import harness
+import sense
+from sense.backfill import Backfill
+from mock_server import MockServer
+
+FEEDS = ['feed%05dtemperature' % n for n in range(8)]
+EVENTS = 5000
+LIMIT = 500
+
+
+def iterate():
+    return [list(sense.Feed(uid).events.iter(limit=LIMIT)) for uid in FEEDS]
+
+
+def arrays():
+    return [sense.Feed(uid).events.to_arrays(limit=LIMIT) for uid in FEEDS]
+
+
+def backfill(output, processes, **options):
+    return lambda: list(Backfill(FEEDS, output=output, processes=processes, limit=LIMIT, **options))
+
+
+if __name__ == '__main__':
+    server = MockServer(events=EVENTS).start()
+    sense.api_url, sense.api_key = server.url, 'bench'
+    directory = tempfile.mkdtemp()
+    total = len(FEEDS) * EVENTS
+    cpus = multiprocessing.cpu_count()
+    print '%d cpus\n' % cpus
+    try:
+        cases = [
+            ('feed.events.iter %d events' % total, iterate, 3),
+            ('feed.events.to_arrays %d events' % total, arrays, 3),
+        ]
+        for processes in sorted(set([1, 2, cpus])):
+            cases += [
+                ('Backfill events, %d processes' % processes, backfill('events', processes), 3),
+                ('Backfill columns, %d processes' % processes, backfill('columns', processes), 3),
+                ('Backfill npz, %d processes' % processes, backfill('npz', processes, directory=directory), 3),
+            ]
+        harness.run('backfill', cases)
+    finally:
+        sense.client.get_default_client().close()
+        server.stop()
+        shutil.rmtree(directory)
@@ -0,0 +1,63 @@
+"""
+End to end throughput and latency of the client against the local mock of the
+Sen.se API (`mock_server.py`): retrieve, list and `all()` pagination, event posts,
+and decoding of pages of several sizes with `convert_to_sense_object`.
+"""
+import json
+import harness
+import sense
+from sense.resources import convert_to_sense_object
+from mock_server import MockServer, MockData
+
+NODES = 1000
+EVENTS = 500
+FEED_UID = 'feed00001temperature'
+
+
+def page(item, size):
+    data = MockData(nodes=size, events=size, url='http://127.0.0.1')
+    body = data.page('/nodes/' if item == 'node' else '/feeds/%s/events/' % FEED_UID,
+                     {'limit': size}, size, data.node if item == 'node' else lambda i: data.event(FEED_UID, i))
+    return json.loads(json.dumps(body))
+
+
+def decode(values):
+    return lambda: convert_to_sense_object(None, values)
+
+
+def exhaust(cls, **params):
+    def bench():
+        for _ in cls.all(**params):
+            pass
+    return bench
+
+
+def cases():
+    feed = sense.Feed(FEED_UID)
+    event = {'data': {'value': 21.5, 'unit': 'C'}, 'dateEvent': '2014-04-16T12:00:00'}
+    pages = [(item, size, page(item, size)) for item in ('node', 'event') for size in (10, 100, 1000)]
+    return [
+        ('Node.retrieve', lambda: sense.Node.retrieve('node00042'), 500),
+        ('Feed.retrieve', lambda: sense.Feed.retrieve(FEED_UID), 500),
+        ('Subscription.retrieve', lambda: sense.Subscription.retrieve('subscription003'), 500),
+        ('Node.list limit=20', lambda: sense.Node.list(limit=20), 200),
+        ('Node.list limit=100', lambda: sense.Node.list(limit=100), 50),
+        ('feed.events.list limit=100', lambda: feed.events.list(limit=100), 50),
+        ('Node.all limit=100 (%d nodes)' % NODES, exhaust(sense.Node, limit=100), 5),
+        ('Node.all limit=100 prefetch=4 (%d nodes)' % NODES, exhaust(sense.Node, limit=100, prefetch=4), 5),
+        ('Event.create', lambda: feed.events.create(**event), 500),
+        ('Event.create_many x100', lambda: feed.events.create_many([event] * 100), 5),
+    ] + [
+        ('convert_to_sense_object %s page/%d' % (item, size), decode(values), max(5, 20000 / size))
+        for item, size, values in pages
+    ]
+
+
+if __name__ == '__main__':
+    server = MockServer(nodes=NODES, events=EVENTS).start()
+    sense.api_url, sense.api_key = server.url, 'bench'
+    try:
+        harness.run('client', cases())
+    finally:
+        sense.client.get_default_client().close()
+        server.stop()
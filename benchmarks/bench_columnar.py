@@ -0,0 +1,60 @@
+"""
+Events as numpy columns (`feed.events.to_arrays`) against `Event` objects built by
+`convert_to_sense_object`: decoding time and memory of a page, and end to end
+listing against the local mock of the API.
+"""
+import json
+import harness
+import sense
+from sense import serializer
+from sense.columnar import to_arrays
+from sense.resources import convert_json, loads_json
+from bench_client import page, FEED_UID
+from bench_records import deep_sizeof
+from mock_server import MockServer
+
+SIZE = 5000
+CONTENT = json.dumps(page('event', SIZE))
+
+
+def objects():
+    return loads_json(CONTENT).objects
+
+
+def two_passes():
+    return convert_json(json.loads(CONTENT)).objects
+
+
+def columns():
+    return to_arrays([serializer.loads(CONTENT)['objects']])
+
+
+def listing(feed):
+    return lambda: list(feed.events.iter(limit=500))
+
+
+def listing_arrays(feed):
+    return lambda: feed.events.to_arrays(limit=500)
+
+
+if __name__ == '__main__':
+    arrays = columns()
+    print 'memory of %d events: Event objects %d KiB, numpy columns %d KiB (%s)\n' % (
+        SIZE, deep_sizeof(objects()) / 1024,
+        sum(a.nbytes + sum(deep_sizeof(v) for v in a if a.dtype == object) for a in arrays.values()) / 1024,
+        ', '.join('%s %s' % (k, a.dtype) for k, a in arrays.items()))
+
+    server = MockServer(events=SIZE).start()
+    sense.api_url, sense.api_key = server.url, 'bench'
+    feed = sense.Feed(FEED_UID)
+    try:
+        harness.run('columnar', [
+            ('decode page/%d (convert_to_sense_object)' % SIZE, two_passes, 10),
+            ('decode page/%d (object_hook)' % SIZE, objects, 10),
+            ('decode page/%d (to_arrays)' % SIZE, columns, 10),
+            ('feed.events.iter %d events' % SIZE, listing(feed), 5),
+            ('feed.events.to_arrays %d events' % SIZE, listing_arrays(feed), 5),
+        ])
+    finally:
+        sense.client.get_default_client().close()
+        server.stop()
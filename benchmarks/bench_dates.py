@@ -0,0 +1,55 @@
+"""
+Date parsing: the ISO-8601 fast path of `utils.parse_datetime` against `dateutil`,
+alone and inside `convert_to_sense_object` on a page of nodes.
+"""
+import datetime
+import harness
+from dateutil import parser
+from sense import utils
+from sense.resources import convert_to_sense_object
+
+start = datetime.datetime(2014, 4, 1, 9, 29, 58, 542637)
+DATES = [(start + datetime.timedelta(seconds=17 * i)).isoformat() for i in range(2000)]
+
+NODE = {
+    'object': 'node', 'uid': 'testuid', 'label': 'node', 'paused': False,
+    'createdAt': '2014-04-01T15:56:12', 'updatedAt': '2014-07-12T12:16:12',
+    'subscribes': [], 'publishes': [],
+}
+PAGE = {'object': 'list', 'totalObjects': 100, 'links': {'next': None, 'prev': None},
+        'objects': [dict(NODE, uid=str(i), updatedAt=DATES[i]) for i in range(100)]}
+
+
+def cold(parse):
+    def bench():
+        utils._date_cache.clear()
+        for d in DATES:
+            parse(d)
+    return bench
+
+
+def warm(parse):
+    def bench():
+        for d in DATES:
+            parse(d)
+    return bench
+
+
+def decode_with(parse):
+    def bench():
+        utils.parse_datetime, original = parse, utils.parse_datetime
+        try:
+            convert_to_sense_object(None, PAGE)
+        finally:
+            utils.parse_datetime = original
+    return bench
+
+
+if __name__ == '__main__':
+    harness.run('dates', [
+        ('dateutil.parser.parse x2000', warm(parser.parse), 5),
+        ('utils.parse_datetime x2000 (cold cache)', cold(utils.parse_datetime), 20),
+        ('utils.parse_datetime x2000 (warm cache)', warm(utils.parse_datetime), 100),
+        ('convert_to_sense_object page/100 (dateutil)', decode_with(parser.parse), 50),
+        ('convert_to_sense_object page/100 (fast path)', decode_with(utils.parse_datetime), 200),
+    ])
@@ -0,0 +1,48 @@
+"""
+Decoding of large pages of nodes limited to a few `fields` (`sense.Node.all(fields=...)`)
+against the decoding of every field, offline and end to end against the local mock of
+the API (which ignores `fields` and returns whole nodes).
+"""
+import json
+import harness
+import sense
+from sense import serializer
+from sense.resources import FieldsDecoder, convert_json, loads_json
+from bench_client import page
+from mock_server import MockServer
+
+SIZE = 1000
+FIELDS = ['uid', 'label', 'updatedAt']
+CONTENT = json.dumps(page('node', SIZE))
+
+
+def every_field():
+    return loads_json(CONTENT)
+
+
+def every_field_two_passes():
+    return convert_json(serializer.loads(CONTENT))
+
+
+def selected_fields():
+    return FieldsDecoder(FIELDS, convert_json)(serializer.loads(CONTENT))
+
+
+def listing(**params):
+    return lambda: list(sense.Node.all(limit=SIZE, **params))
+
+
+if __name__ == '__main__':
+    server = MockServer(nodes=SIZE * 5).start()
+    sense.api_url, sense.api_key = server.url, 'bench'
+    try:
+        harness.run('fields', [
+            ('decode page/%d (object_hook)' % SIZE, every_field, 20),
+            ('decode page/%d (convert_to_sense_object)' % SIZE, every_field_two_passes, 20),
+            ('decode page/%d (fields=%s)' % (SIZE, ','.join(FIELDS)), selected_fields, 20),
+            ('Node.all %d nodes' % (SIZE * 5), listing(), 5),
+            ('Node.all %d nodes (fields)' % (SIZE * 5), listing(fields=FIELDS), 5),
+        ])
+    finally:
+        sense.client.get_default_client().close()
+        server.stop()
@@ -0,0 +1,57 @@
+"""
+Throughput of `sense.gateway.GatewayServer` under local load: single events and
+batches posted over keep-alive connections, sequentially and from concurrent senders.
+"""
+import json
+import threading
+import requests
+import harness
+from sense import utils
+from sense.gateway import GatewayServer
+from mock_server import MockData
+
+EVENT = json.dumps(MockData().event('feed00001temperature', 42))
+BATCH = json.dumps([json.loads(EVENT)] * 100)
+SENDERS = 8
+
+
+def sender(url, body):
+    session = requests.Session()
+    session.auth = utils.token_auth('bench', 'secret')
+
+    def bench():
+        r = session.post(url, data=body)
+        assert r.status_code == 204, r.status_code
+    return bench
+
+
+def concurrent(url, body, posts):
+    senders = [sender(url, body) for _ in range(SENDERS)]
+
+    def send(bench):
+        for _ in xrange(posts):
+            bench()
+
+    def bench():
+        threads = [threading.Thread(target=send, args=(s,)) for s in senders]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    return bench
+
+
+if __name__ == '__main__':
+    received = []
+    server = GatewayServer(('127.0.0.1', 0), api_key='bench', app_secret='secret', callback=received.append).start()
+    url = 'http://127.0.0.1:%s/' % server.server_port
+    try:
+        harness.run('gateway', [
+            ('POST 1 event', sender(url, EVENT), 2000),
+            ('POST 100 events', sender(url, BATCH), 200),
+            ('%d senders x 250 POST 1 event' % SENDERS, concurrent(url, EVENT, 250), 5),
+            ('%d senders x 25 POST 100 events' % SENDERS, concurrent(url, BATCH, 25), 5),
+        ])
+    finally:
+        server.stop()
+    print '\n%d events received' % len(received)
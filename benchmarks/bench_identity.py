@@ -0,0 +1,49 @@
+"""
+Decoding time and memory of a page of nodes subscribing to the same feeds, with and
+without the identity map of the client (`sense.Client(identity_map=True)`).
+"""
+import json
+import harness
+from sense import serializer
+from sense.identity import IdentityMap
+from sense.resources import convert_json, loads_json
+from bench_records import deep_sizeof
+
+FEEDS = [{'object': 'feed', 'uid': 'feed%05d' % i, 'label': 'Feed %d' % i, 'type': 'motion',
+          'url': 'https://sen.se/api/v2/feeds/feed%05d/' % i} for i in range(20)]
+NODES = [{'object': 'node', 'uid': 'node%05d' % i, 'label': 'Node %d' % i, 'paused': False,
+          'url': 'https://sen.se/api/v2/nodes/node%05d/' % i,
+          'createdAt': '2014-04-01T15:56:12', 'updatedAt': '2014-07-12T12:16:12',
+          'subscribes': FEEDS, 'publishes': [FEEDS[i % len(FEEDS)]]} for i in range(1000)]
+CONTENT = json.dumps({'object': 'list', 'totalObjects': len(NODES), 'links': {'next': None, 'prev': None},
+                      'objects': NODES})
+
+
+def hook(identity_map=None):
+    def bench():
+        if identity_map is None:
+            return loads_json(CONTENT)
+        with identity_map.decoding():
+            return loads_json(CONTENT)
+    return bench
+
+
+def two_passes(identity_map=None):
+    def bench():
+        if identity_map is None:
+            return convert_json(serializer.loads(CONTENT))
+        with identity_map.decoding():
+            return convert_json(serializer.loads(CONTENT))
+    return bench
+
+
+if __name__ == '__main__':
+    print 'memory of %d nodes subscribing to %d feeds: %d KiB, with the identity map %d KiB\n' % (
+        len(NODES), len(FEEDS), deep_sizeof(two_passes()().objects) / 1024,
+        deep_sizeof(two_passes(IdentityMap())().objects) / 1024)
+    harness.run('identity map', [
+        ('decode page/1000 (convert_to_sense_object)', two_passes(), 10),
+        ('decode page/1000 (convert_to_sense_object, map)', two_passes(IdentityMap()), 10),
+        ('decode page/1000 (object_hook)', hook(), 10),
+        ('decode page/1000 (object_hook, map)', hook(IdentityMap()), 10),
+    ])
@@ -0,0 +1,44 @@
+"""
+Decoding of large list pages: parsing then converting the values (two passes) against
+building the resources while parsing (`object_hook`), and the ujson backend when installed.
+"""
+import json
+import harness
+import sense
+from sense import serializer
+from sense.resources import convert_json, loads_json
+from bench_client import page
+
+PAGES = [('node', 1000, json.dumps(page('node', 1000))), ('event', 5000, json.dumps(page('event', 5000)))]
+EVENT = {'data': {'value': 21.5, 'unit': 'C'}, 'dateEvent': '2014-04-16T12:00:00'}
+
+
+def two_passes(loads, content):
+    return lambda: convert_json(loads(content))
+
+
+def single_pass(content):
+    def bench():
+        sense.json_backend = 'json'
+        try:
+            loads_json(content)
+        finally:
+            sense.json_backend = None
+    return bench
+
+
+def backends():
+    yield 'json', json
+    if serializer.ujson is not None:
+        yield 'ujson', serializer.ujson
+
+
+if __name__ == '__main__':
+    cases = []
+    for item, size, content in PAGES:
+        for name, lib in backends():
+            cases.append(('%s page/%d %s + convert' % (item, size, name), two_passes(lib.loads, content), 10))
+        cases.append(('%s page/%d json object_hook' % (item, size), single_pass(content), 10))
+    for name, lib in backends():
+        cases.append(('Event body dumps (%s)' % name, lambda lib=lib: lib.dumps(EVENT), 20000))
+    harness.run('json', cases)
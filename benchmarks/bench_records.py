@@ -0,0 +1,77 @@
+"""
+Memory footprint, decoding and attribute access of the compact records
+(`sense.compact_resources`) against the default dict based resources.
+"""
+import sys
+import json
+import harness
+import sense
+from sense.resources import convert_to_sense_object
+
+FEED = {'object': 'feed', 'uid': 'OlkQpUi5x4rS8RyxNOpKYR9CrPrGuhWg', 'label': 'Motion', 'type': 'motion',
+        'url': 'https://sen.se/api/v2/feeds/OlkQpUi5x4rS8RyxNOpKYR9CrPrGuhWg/'}
+NODE = {'object': 'node', 'uid': 'testuid', 'label': 'node', 'paused': False,
+        'url': 'https://sen.se/api/v2/nodes/testuid/',
+        'createdAt': '2014-04-01T15:56:12', 'updatedAt': '2014-07-12T12:16:12',
+        'subscribes': [FEED], 'publishes': [FEED, FEED]}
+PAGE = json.loads(json.dumps({'object': 'list', 'totalObjects': 1000, 'links': {'next': None, 'prev': None},
+                              'objects': [dict(NODE, uid='node%s' % i) for i in range(1000)]}))
+
+
+def deep_sizeof(o, seen=None):
+    """
+    Bytes used by `o` and the containers and records it references (strings and dates
+    shared by both representations are counted once).
+    """
+    seen = seen if seen is not None else set()
+    if id(o) in seen:
+        return 0
+    seen.add(id(o))
+    size = sys.getsizeof(o)
+    if isinstance(o, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in o.iteritems())
+    elif isinstance(o, (list, tuple)):
+        size += sum(deep_sizeof(e, seen) for e in o)
+    elif isinstance(o, sense.records.Record):
+        size += sum(deep_sizeof(v, seen) for v in o.itervalues())
+    return size
+
+
+def decode(compact):
+    def bench():
+        sense.compact_resources = compact
+        try:
+            return convert_to_sense_object(None, PAGE)
+        finally:
+            sense.compact_resources = False
+    return bench
+
+
+def access(page):
+    nodes = page.objects
+    def bench():
+        for n in nodes:
+            n.uid, n.label, n.updatedAt
+    return bench
+
+
+def probe(page):
+    nodes = page.objects
+    def bench():
+        for n in nodes:
+            hasattr(n, 'missing')
+    return bench
+
+
+if __name__ == '__main__':
+    dicts, compact = decode(False)(), decode(True)()
+    print 'memory of 1000 nodes: dict %d KiB, compact %d KiB\n' % (
+        deep_sizeof(dicts.objects) / 1024, deep_sizeof(compact.objects) / 1024)
+    harness.run('records', [
+        ('decode page/1000 (dict)', decode(False), 20),
+        ('decode page/1000 (compact)', decode(True), 20),
+        ('attribute access x1000 (dict)', access(dicts), 200),
+        ('attribute access x1000 (compact)', access(compact), 200),
+        ('missing attribute probe x1000 (dict)', probe(dicts), 200),
+        ('missing attribute probe x1000 (compact)', probe(compact), 200),
+    ])
@@ -0,0 +1,47 @@
+"""
+Compare two results files saved with `--json`, e.g. before and after a change::
+
+    $ python benchmarks/bench_client.py --json before.json
+    $ python benchmarks/bench_client.py --json after.json
+    $ python benchmarks/compare.py before.json after.json --threshold 10
+
+Exits with status 1 when a case lost more than `threshold` percent of its throughput.
+"""
+import sys
+import json
+import argparse
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(before, after, threshold=10.0):
+    """
+    Print the throughput change of each case measured in both results, returns the regressed cases.
+    """
+    regressions = []
+    print '%-56s %12s %12s %8s' % ('%s -> %s' % (before['version'], after['version']), 'before', 'after', 'change')
+    for name, cases in sorted(after['results'].iteritems()):
+        for label, r in sorted(cases.iteritems()):
+            old = before['results'].get(name, {}).get(label)
+            if old is None:
+                continue
+            change = (r['ops_per_sec'] / old['ops_per_sec'] - 1) * 100
+            flag = ''
+            if change < -threshold:
+                flag = ' !'
+                regressions.append((name, label, change))
+            print '%-56s %12.1f %12.1f %+7.1f%%%s' % ('%s: %s' % (name, label), old['ops_per_sec'],
+                                                      r['ops_per_sec'], change, flag)
+    return regressions
+
+
+if __name__ == '__main__':
+    args = argparse.ArgumentParser(description='compare benchmark results')
+    args.add_argument('before')
+    args.add_argument('after')
+    args.add_argument('--threshold', type=float, default=10.0, help='regression threshold in percent')
+    args = args.parse_args()
+    sys.exit(1 if compare(load(args.before), load(args.after), args.threshold) else 0)
@@ -0,0 +1,71 @@
+"""
+Helpers shared by the benchmark scripts of this directory.
+
+Run a benchmark from the repository root, e.g.::
+
+    $ python benchmarks/bench_dates.py
+    $ python benchmarks/bench_dates.py --json results.json
+"""
+import os
+import sys
+import json
+import timeit
+import argparse
+
+# Benchmark the working copy rather than an installed release
+sys.path.insert(0, os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)))
+
+import sense
+
+
+def percentile(timings, p):
+    timings = sorted(timings)
+    return timings[min(len(timings) - 1, int(len(timings) * p / 100.0))]
+
+
+def measure(func, number=1000, setup=None):
+    """
+    Call `func` `number` times (after `setup` if given) and returns its throughput and latencies.
+    """
+    if setup:
+        setup()
+    timer = timeit.default_timer
+    timings = []
+    for _ in xrange(number):
+        t0 = timer()
+        func()
+        timings.append(timer() - t0)
+    total = sum(timings)
+    return {
+        'number': number,
+        'ops_per_sec': number / total if total else float('inf'),
+        'p50_ms': percentile(timings, 50) * 1000,
+        'p99_ms': percentile(timings, 99) * 1000,
+    }
+
+
+def run(name, cases, argv=None):
+    """
+    Measure each (label, func, number) case, print a table and optionally save it as json.
+    """
+    args = argparse.ArgumentParser(description=name)
+    args.add_argument('--json', help='save the results to this file')
+    args.add_argument('--scale', type=float, default=1.0, help='multiply the number of calls')
+    args = args.parse_args(argv)
+
+    results = {}
+    print '%-48s %12s %10s %10s' % (name, 'ops/sec', 'p50 ms', 'p99 ms')
+    for label, func, number in cases:
+        r = measure(func, max(1, int(number * args.scale)))
+        results[label] = r
+        print '%-48s %12.1f %10.4f %10.4f' % (label, r['ops_per_sec'], r['p50_ms'], r['p99_ms'])
+
+    if args.json:
+        save(args.json, {name: results})
+    return results
+
+
+def save(path, results):
+    with open(path, 'w') as f:
+        json.dump({'version': sense.VERSION, 'python': sys.version.split()[0],
+                   'results': results}, f, indent=2, sort_keys=True)
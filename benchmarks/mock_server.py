@@ -0,0 +1,159 @@
+"""
+Local, deterministic mock of the Sen.se v2 API used by the client benchmarks.
+
+Serves nodes, their feeds, feeds events, subscriptions and the user, with paged
+lists (`page` and `limit` query parameters, `totalObjects` and `links`). Connections
+are kept alive so the client connection pool is exercised.
+
+    $ python benchmarks/mock_server.py 8200
+"""
+import sys
+import json
+import urlparse
+import threading
+import BaseHTTPServer
+import SocketServer
+
+DATE = '2014-07-12T12:16:12'
+FEED_TYPES = ('motion', 'temperature', 'battery')
+
+
+class MockData(object):
+    """
+    `nodes` nodes publishing one feed per type, `events` events per feed.
+    """
+
+    def __init__(self, nodes=1000, events=500, url=''):
+        self.url = url
+        self.node_count = nodes
+        self.event_count = events
+
+    def feed(self, node, feed_type):
+        uid = 'feed%05d%s' % (node, feed_type)
+        return {'object': 'feed', 'url': '%s/feeds/%s/' % (self.url, uid), 'uid': uid,
+                'label': feed_type.title(), 'type': feed_type, 'node': 'node%05d' % node,
+                'createdAt': DATE, 'updatedAt': DATE}
+
+    def node(self, n):
+        uid = 'node%05d' % n
+        return {'object': 'node', 'url': '%s/nodes/%s/' % (self.url, uid), 'uid': uid,
+                'label': 'Node %d' % n, 'paused': False, 'createdAt': DATE,
+                'updatedAt': '2014-07-12T12:%02d:%02d' % (n / 60 % 60, n % 60),
+                'subscribes': [], 'publishes': [self.feed(n, t) for t in FEED_TYPES],
+                'resource': {'object': 'resource', 'type': 'device', 'slug': 'cookie'}}
+
+    def event(self, feed_uid, n):
+        return {'dateEvent': '2014-04-16T12:%02d:%02d.542637' % (n / 60 % 60, n % 60),
+                'dateServer': '2014-04-16T12:%02d:%02d.600000' % (n / 60 % 60, n % 60),
+                'feedUid': feed_uid, 'nodeUid': feed_uid[:9], 'profile': None,
+                'signal': None, 'version': None, 'payload': n % 100,
+                'data': {'value': n % 100, 'unit': 'C'}}
+
+    def subscription(self, n):
+        uid = 'subscription%03d' % n
+        return {'object': 'subscription', 'url': '%s/subscriptions/%s/' % (self.url, uid),
+                'uid': uid, 'label': 'Subscription %d' % n, 'paused': False,
+                'gatewayUrl': 'https://example.com/events/', 'createdAt': DATE, 'updatedAt': DATE,
+                'subscribes': [self.feed(n, 'motion')], 'publishes': []}
+
+    def user(self):
+        return {'object': 'user', 'username': 'bench', 'country': 'FR', 'createdAt': DATE,
+                'updatedAt': DATE, 'devices': [], 'applications': []}
+
+    def page(self, path, query, total, item):
+        limit = int(query.get('limit', 20))
+        number = int(query.get('page', 1))
+        start = (number - 1) * limit
+        link = lambda n: '%s%s?%s' % (self.url, path, '&'.join(
+            '%s=%s' % (k, v) for k, v in sorted(dict(query, page=n).items())))
+        return {'object': 'list', 'totalObjects': total,
+                'links': {'next': link(number + 1) if start + limit < total else None,
+                          'prev': link(number - 1) if number > 1 else None},
+                'objects': [item(i) for i in xrange(start, min(start + limit, total))]}
+
+    def get(self, path, query):
+        """
+        Returns the json body answering a GET on `path`, or None (404).
+        """
+        segments = [s for s in path.split('/') if s]
+        n = len(segments)
+        if segments == ['user']:
+            return self.user()
+        if segments == ['nodes']:
+            return self.page(path, query, self.node_count, self.node)
+        if segments == ['subscriptions']:
+            return self.page(path, query, 10, self.subscription)
+        if n >= 2 and segments[0] == 'nodes':
+            node = int(segments[1][4:])
+            if n == 2:
+                return self.node(node)
+            if n == 3 and segments[2] == 'feeds':
+                return self.page(path, query, len(FEED_TYPES), lambda i: self.feed(node, FEED_TYPES[i]))
+            if n == 4 and segments[2] == 'feeds' and segments[3] in FEED_TYPES:
+                return self.feed(node, segments[3])
+        if n >= 2 and segments[0] == 'feeds':
+            uid = segments[1]
+            if n == 2:
+                return self.feed(int(uid[4:9]), uid[9:])
+            if n == 3 and segments[2] == 'events':
+                return self.page(path, query, self.event_count, lambda i: self.event(uid, i))
+        if n == 2 and segments[0] == 'subscriptions':
+            return self.subscription(int(segments[1][12:]))
+
+
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Send each response in one segment, small writes would stall on delayed acks
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlparse.urlsplit(self.path)
+        query = dict(urlparse.parse_qsl(url.query))
+        try:
+            body = self.server.data.get(url.path, query)
+        except (ValueError, IndexError):
+            body = None
+        self.respond(200 if body is not None else 404, body)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        self.rfile.read(length)
+        path = urlparse.urlsplit(self.path).path
+        self.respond(201 if path.endswith('/events/') else 404, {})
+
+    def respond(self, status, body):
+        content = json.dumps(body) if body is not None else '{"detail": "Not found"}'
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+class MockServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, **data):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', port), Handler)
+        self.url = 'http://127.0.0.1:%s' % self.server_port
+        self.data = MockData(url=self.url, **data)
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == '__main__':
+    server = MockServer(int(sys.argv[1]) if len(sys.argv) > 1 else 8200)
+    print 'Mock Sen.se API on %s' % server.url
+    server.serve_forever()
@@ -10,5 +10,23 @@ app_secret = None
 
 user_agent = 'Sen.se python client'
 
+# Convert nested objects and dates on first access instead of when a response is received
+# (dict(resource) and **resource see the raw values of the keys not read yet)
+lazy_decode = False
+
+# Build read-only slotted records (see sense.records) instead of dicts for decoded objects
+compact_resources = False
+
+# JSON library: 'json', 'ujson', an object with loads/dumps, or None for ujson when installed
+json_backend = None
+
+# Pooled client used by every request, see sense.Client (defaults to the settings above)
+default_client = None
+
+from client import Client, ClientPool
+from cache import LRUCache, SQLiteCache
+from scheduler import Scheduler
+from metrics import MetricsCollector
 from resources import User, Node, Feed, Subscription, Event, Device, Application, Person
+from batch import EventBatcher
 from version import VERSION
@@ -0,0 +1,115 @@
+"""
+Non-blocking counterparts of the resource classes.
+
+Python 2.7 has no asyncio, so the calls run on the worker threads of the pooled
+client (see `sense.Client.executor`) and immediately return an `AsyncResult`
+(`multiprocessing.pool.ApplyResult`): `.get(timeout)` waits for the decoded
+object, `.ready()` polls it. Responses are decoded by the same resource classes,
+through `convert_to_sense_object`.
+
+>>> import sense.aio
+>>> sense.api_key = '{{ api_key }}'
+>>> pending = [sense.aio.Node.retrieve(uid) for uid in ['{{ node.uid }}', '{{ other_node.uid }}']]
+>>> nodes = [p.get() for p in pending]
+>>> for node in sense.aio.Node.all():
+>>>     assert hasattr(node, 'uid')
+"""
+from client import get_default_client
+import resources
+
+
+def submit(func, *args, **kwargs):
+    """
+    Run any blocking call (e.g. `node.feeds.retrieve`) on the client executor. Calls
+    sending requests in parallel (`all(prefetch=...)`, `retrieve_many`) do not wait for
+    the executor from there, which would deadlock once every worker waits.
+    """
+    return get_default_client().executor.apply_async(func, args, kwargs)
+
+
+def iter_pages(pending, prefetch=1):
+    """
+    Iterate over the objects of a pending list page and of the following pages,
+    fetched ahead (see `ListAPIResource.yield_all`).
+    """
+    for o in pending.get().yield_all(prefetch=prefetch):
+        yield o
+
+
+class AsyncAPIResource(object):
+    resource = None
+
+    @classmethod
+    def retrieve(cls, uid, **params):
+        return submit(cls.resource.retrieve, uid, **params)
+
+
+class AsyncListAPIResource(AsyncAPIResource):
+
+    @classmethod
+    def list(cls, **params):
+        return submit(cls.resource.list, **params)
+
+    @classmethod
+    def all(cls, prefetch=1, **params):
+        return iter_pages(cls.list(**params), prefetch)
+
+
+class User(AsyncAPIResource):
+    resource = resources.User
+
+    @classmethod
+    def retrieve(cls, uid=None, **params):
+        return submit(cls.resource.retrieve, uid, **params)
+
+
+class Node(AsyncListAPIResource):
+    resource = resources.Node
+
+
+class Feed(AsyncListAPIResource):
+    resource = resources.Feed
+
+
+class Subscription(AsyncListAPIResource):
+    resource = resources.Subscription
+
+    @classmethod
+    def create(cls, **params):
+        return submit(cls.resource.create, **params)
+
+    @staticmethod
+    def save(subscription):
+        return submit(subscription.save)
+
+    @staticmethod
+    def delete(subscription):
+        return submit(subscription.delete)
+
+
+class Event(object):
+    """
+    Events of a feed, given as a `sense.Feed` or a feed uid.
+
+    >>> import sense.aio
+    >>> sense.api_key = '{{ api_key }}'
+    >>> events = sense.aio.Event.list('{{ feed.uid }}', limit=3).get()
+    """
+
+    @staticmethod
+    def _events(feed):
+        if not isinstance(feed, resources.Feed):
+            feed = resources.Feed(feed)
+        return feed.events
+
+    @classmethod
+    def list(cls, feed, **params):
+        return submit(cls._events(feed).list, **params)
+
+    @classmethod
+    def all(cls, feed, prefetch=1, **params):
+        return iter_pages(cls.list(feed, **params), prefetch)
+
+    @classmethod
+    def create(cls, feed, **params):
+        return submit(cls._events(feed).create, **params)
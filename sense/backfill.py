@@ -0,0 +1,225 @@
+"""
+Backfill of the events of feeds, decoded over several processes.
+
+Fetching threads request the pages of events (the windows of `Event.iter`, then their
+next links) through the pooled client and hand the raw response bodies to a
+`multiprocessing.Pool`, whose processes parse and convert them to `output`:
+
+    * 'columns': the numpy columns of the page (see `sense.columnar`), the cheapest
+      results to send back to the parent process,
+    * 'npz': the columns written to `directory`, one `.npz` file per page, only its
+      path is sent back,
+    * 'json': the parsed json objects,
+    * 'events': the resources returned by `feed.events.list`.
+
+At most `queue_size` pages are fetched and not yet consumed, which holds the fetching
+threads back when the processes or the consumer fall behind the network. The pages of
+a window are requested one after the other (each holds the link of the next one), so
+keep the windows small enough to give every fetching thread and process some work.
+
+>>> import datetime
+>>> import sense
+>>> from sense.backfill import Backfill
+>>> sense.api_key = '{{ api_key }}'
+>>> end = datetime.datetime.utcnow()
+>>> backfill = Backfill(['{{ feed.uid }}', '{{ other_feed.uid }}'], start=end - datetime.timedelta(days=365),
+>>>                     end=end, window=datetime.timedelta(days=7), processes=4, fetchers=8, limit=1000)
+>>> columns = backfill.to_arrays()
+>>> columns['{{ feed.uid }}']['data.value']
+"""
+import os
+import Queue
+import threading
+import multiprocessing
+import utils
+import columnar
+import serializer
+from resources import Feed, Event, loads_json, prepare_request
+
+OUTPUTS = ('columns', 'npz', 'json', 'events')
+
+
+def decode_page(content, output, fields=None, path=None):
+    """
+    Decode a page of events, in a worker process. Returns its next link, its number of
+    events and the events converted to `output`.
+    """
+    if output == 'events':
+        page = loads_json(content)
+        objects = page.get('objects') or []
+        return (page.get('links') or {}).get('next'), len(objects), objects
+    values = serializer.loads(content)
+    next_url = (values.get('links') or {}).get('next')
+    objects = values.get('objects') or []
+    if output == 'json':
+        return next_url, len(objects), objects
+    builder = columnar.ColumnBuilder(fields)
+    builder.add_page(objects)
+    if output == 'columns':
+        return next_url, len(objects), builder
+    columnar.numpy.savez(path, **builder.arrays())
+    return next_url, len(objects), path
+
+
+def _decode_task(args):
+    # Errors are sent back as results, `apply_async` has no error callback in python 2
+    try:
+        return True, decode_page(*args)
+    except Exception, err:
+        return False, err
+
+
+class Backfill(object):
+
+    def __init__(self, feeds, start=None, end=None, window=None, output='columns', fields=None,
+                 directory=None, processes=None, fetchers=8, queue_size=64, **params):
+        """
+        Backfill the events of `feeds` (`Feed` objects or feed uids) between `start` and
+        `end`, listed `window` after `window` (see `Event.iter`) with `params`, from
+        `fetchers` threads and `processes` worker processes (one per cpu by default).
+        `fields` limits the columns of the 'columns' and 'npz' outputs.
+        """
+        if output not in OUTPUTS:
+            raise ValueError('output should be one of %s' % ', '.join(OUTPUTS))
+        if output in ('columns', 'npz'):
+            columnar.require(columnar.numpy, 'numpy')
+        if output == 'npz' and directory is None:
+            raise ValueError('The npz output needs a directory')
+        self.feeds = [f if isinstance(f, Feed) else Feed(f) for f in feeds]
+        self.start = start
+        self.end = end
+        self.window = window
+        self.output = output
+        self.fields = fields
+        self.directory = directory
+        self.processes = processes
+        self.fetchers = fetchers
+        self.client, self.api_url, self.params = prepare_request(params)
+        self.pages = self.events = 0
+        self._slots = threading.Semaphore(queue_size)
+        self._urls = Queue.Queue()
+        self._results = Queue.Queue()
+        self._lock = threading.Lock()
+        self._chains = 0
+        self._pool = None
+        self._threads = []
+        self._closed = False
+
+    def _start(self):
+        chains = []
+        for feed in self.feeds:
+            url = self.api_url + feed.events._events_path()
+            windows = Event._windows(self.start, self.end, self.window, dict(self.params))
+            for n, params in enumerate(windows):
+                chains.append(((feed, n, 0), url, utils.expand(params)))
+        self._chains = len(chains)
+        if not chains:
+            self._results.put(None)
+            return
+        # Fork the processes before starting any thread
+        self._pool = multiprocessing.Pool(self.processes)
+        for chain in chains:
+            self._urls.put(chain)
+        for _ in range(self.fetchers):
+            thread = threading.Thread(target=self._fetch)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def _fetch(self):
+        while True:
+            task = self._urls.get()
+            if task is None:
+                return
+            # Wait for a page to be consumed when `queue_size` pages are pending
+            self._slots.acquire()
+            if self._closed:
+                return
+            key, url, params = task
+            try:
+                r = self.client.request('GET', url, params=params)
+                r.raise_for_status()
+            except Exception, err:
+                self._results.put((key, 0, err))
+                continue
+            path = None
+            if self.output == 'npz':
+                feed, window, page = key
+                path = os.path.join(self.directory, '%s-%05d-%05d.npz' % (feed.uid, window, page))
+            self._pool.apply_async(_decode_task, ((r.content, self.output, self.fields, path),),
+                                   callback=lambda result, key=key: self._decoded(key, result))
+
+    def _decoded(self, key, result):
+        ok, value = result
+        if not ok:
+            self._results.put((key, 0, value))
+            return
+        next_url, count, page = value
+        self._results.put((key, count, page))
+        if next_url:
+            feed, window, n = key
+            self._urls.put(((feed, window, n + 1), next_url, None))
+            return
+        with self._lock:
+            self._chains -= 1
+            done = not self._chains
+        if done:
+            self._results.put(None)
+
+    def _pages(self):
+        """
+        Iterate over the ((feed, window, page), page) pairs as they are decoded.
+        """
+        self._start()
+        try:
+            while True:
+                item = self._results.get()
+                if item is None:
+                    return
+                key, count, page = item
+                self._slots.release()
+                if isinstance(page, Exception):
+                    raise page
+                self.pages += 1
+                self.events += count
+                yield key, page
+        finally:
+            self.close()
+
+    def __iter__(self):
+        """
+        Iterate over the (feed, page) pairs as they are decoded, a page being a dict of
+        numpy arrays, a file path or a list of events depending on `output`.
+        """
+        for key, page in self._pages():
+            yield key[0], page.arrays() if self.output == 'columns' else page
+
+    def to_arrays(self):
+        """
+        Returns the columns of the events of each feed (see `Event.to_arrays`), by feed uid.
+        """
+        if self.output != 'columns':
+            raise ValueError('to_arrays needs the columns output')
+        pages = sorted(self._pages(), key=lambda item: item[0][1:])
+        builders = dict((feed.uid, columnar.ColumnBuilder(self.fields)) for feed in self.feeds)
+        for (feed, _, __), page in pages:
+            builders[feed.uid].extend(page)
+        return dict((uid, builder.arrays()) for uid, builder in builders.iteritems())
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        for _ in self._threads:
+            self._urls.put(None)
+            self._slots.release()
+        if self._pool is not None:
+            if self._chains:
+                self._pool.terminate()
+            else:
+                self._pool.close()
+            self._pool.join()
+
+    def stats(self):
+        return {'pages': self.pages, 'events': self.events, 'pending': self._results.qsize()}
@@ -0,0 +1,80 @@
+import threading
+from resources import Feed
+
+
+class EventBatcher(object):
+    """
+    Buffers events grouped by feed and posts them with `Feed.events.create_many` once
+    `max_size` events are waiting or `max_delay` seconds after the first buffered event.
+
+    `flush` returns the `BulkResult` of every sent event; flushes triggered by the timer
+    hand them to `callback` when one is given.
+
+    >>> import sense
+    >>> sense.api_key = '{{ api_key }}'
+    >>> with sense.EventBatcher(max_size=500, max_delay=1.0) as batcher:
+    >>>     batcher.add('{{ feed.uid }}', data={'key': 'value'})
+    """
+
+    def __init__(self, max_size=500, max_delay=1.0, callback=None):
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self.callback = callback
+        self._feeds = {}
+        self._events = {}
+        self._size = 0
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def add(self, feed, **event):
+        """
+        Buffer an event for `feed`, a `Feed` or a feed uid.
+        """
+        if not isinstance(feed, Feed):
+            feed = Feed(feed)
+        key = feed.instance_url()
+
+        with self._lock:
+            self._feeds.setdefault(key, feed)
+            self._events.setdefault(key, []).append(event)
+            self._size += 1
+            full = self._size >= self.max_size
+            if not full and self._timer is None and self.max_delay is not None:
+                self._timer = threading.Timer(self.max_delay, self._flush_on_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+        if full:
+            return self.flush()
+
+    def flush(self):
+        with self._lock:
+            feeds, events = self._feeds, self._events
+            self._feeds, self._events, self._size = {}, {}, 0
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        results = []
+        for key, feed_events in events.iteritems():
+            results.extend(feeds[key].events.create_many(feed_events))
+        if results and self.callback:
+            self.callback(results)
+        return results
+
+    def _flush_on_timer(self):
+        with self._lock:
+            self._timer = None
+        self.flush()
+
+    def close(self):
+        return self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
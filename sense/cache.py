@@ -0,0 +1,247 @@
+"""
+Client side cache of GET responses (see `sense.Client(cache=...)`).
+
+Fresh entries are served without a request. Expired entries holding an `ETag` or
+`Last-Modified` header are revalidated with a conditional GET, and the cached body is
+reused when the server answers 304 Not Modified. Any PUT, POST or DELETE sent
+through the client invalidates the cached responses of the collection it changes.
+
+>>> import sense
+>>> sense.default_client = sense.Client(cache=sense.LRUCache(ttl=60, ttls={'nodes': 300, 'user': 3600}))
+>>> sense.Node.retrieve('{{ node.uid }}')
+>>> sense.default_client.cache.stats()
+
+`SQLiteCache` keeps the responses on disk, so a restarted process serves them right
+away: entries older than their ttl but younger than `max_stale` are returned as is
+while the client refreshes them in the background.
+
+>>> sense.default_client = sense.Client(cache=sense.SQLiteCache('sense-cache.db', ttl=300, max_stale=86400))
+"""
+import time
+import hashlib
+import sqlite3
+import threading
+import urlparse
+from collections import namedtuple, OrderedDict
+
+
+class CacheEntry(namedtuple('CacheEntry', ['content', 'encoding', 'etag', 'last_modified', 'stored_at'])):
+    __slots__ = ()
+
+
+def resource_type(path):
+    """
+    Name of the collection a path (relative to the api url) belongs to: 'nodes' for
+    `/nodes/<uid>/`, 'feeds' for `/nodes/<uid>/feeds/<type>/`, 'events' for `/feeds/<uid>/events/`.
+    """
+    segments = [s for s in urlparse.urlsplit(path).path.split('/') if s]
+    return segments[::2][-1] if segments else ''
+
+
+class ResponseCache(object):
+    """
+    Interface of the response caches used by `sense.Client`. Keys are (api_url, api_key, path)
+    tuples, the path being relative to the api url and including the query string.
+    """
+
+    def get(self, key):
+        """
+        Returns a (CacheEntry, fresh) pair or (None, False).
+        """
+        raise NotImplementedError
+
+    def set(self, key, entry):
+        raise NotImplementedError
+
+    def touch(self, key):
+        """
+        Mark an entry fresh again after a 304 Not Modified.
+        """
+        raise NotImplementedError
+
+    def serve_stale(self, key, entry):
+        """
+        Whether an expired entry can be returned while the client refreshes it in the background.
+        """
+        return False
+
+    def invalidate(self, prefix):
+        """
+        Drop the entries whose path starts with `prefix`.
+        """
+        raise NotImplementedError
+
+    def stats(self):
+        raise NotImplementedError
+
+
+class LRUCache(ResponseCache):
+    """
+    In-memory cache of at most `max_entries` responses, expiring after `ttl` seconds or
+    after `ttls[resource_type]` (a ttl of 0 disables caching of that type).
+    """
+
+    def __init__(self, max_entries=1024, ttl=60, ttls=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.ttls = {'events': 0}
+        self.ttls.update(ttls or {})
+        self.hits = self.misses = self.evictions = self.revalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def ttl_for(self, path):
+        return self.ttls.get(resource_type(path), self.ttl)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                return None, False
+            self._entries[key] = entry
+            fresh = time.time() - entry.stored_at < self.ttl_for(key[2])
+            if fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return entry, fresh
+
+    def set(self, key, entry):
+        if not self.ttl_for(key[2]):
+            return
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def touch(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = entry._replace(stored_at=time.time())
+            self.revalidations += 1
+
+    def invalidate(self, prefix):
+        with self._lock:
+            for key in [k for k in self._entries if k[2].startswith(prefix)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'revalidations': self.revalidations}
+
+
+def resource_uid(path):
+    """
+    Uid of the resource a path points to: '<uid>' for `/nodes/<uid>/`, None for `/nodes/`.
+    """
+    segments = [s for s in urlparse.urlsplit(path).path.split('/') if s]
+    return segments[-1] if len(segments) % 2 == 0 else None
+
+
+class SQLiteCache(ResponseCache):
+    """
+    Cache of the responses in the SQLite database `path`, indexed by resource type
+    and uid. Entries expire after `ttl` seconds or after `ttls[resource_type]`, then
+    are served stale (and refreshed in the background) until `max_stale` seconds.
+    The api keys are stored hashed.
+    """
+
+    def __init__(self, path, ttl=60, ttls=None, max_stale=86400):
+        self.path = path
+        self.ttl = ttl
+        self.ttls = {'events': 0}
+        self.ttls.update(ttls or {})
+        self.max_stale = max_stale
+        self.hits = self.misses = self.stale = self.revalidations = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.text_factory = str
+        with self._db:
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                ' api_url TEXT, api_key TEXT, path TEXT, type TEXT, uid TEXT,'
+                ' content BLOB, encoding TEXT, etag TEXT, last_modified TEXT, stored_at REAL,'
+                ' PRIMARY KEY (api_url, api_key, path))')
+            self._db.execute('CREATE INDEX IF NOT EXISTS responses_uid ON responses (type, uid)')
+
+    def ttl_for(self, path):
+        return self.ttls.get(resource_type(path), self.ttl)
+
+    @staticmethod
+    def _key(key):
+        api_url, api_key, path = key
+        return api_url, hashlib.sha1(api_key or '').hexdigest(), path
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute(
+                'SELECT content, encoding, etag, last_modified, stored_at FROM responses'
+                ' WHERE api_url = ? AND api_key = ? AND path = ?', self._key(key)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None, False
+            entry = CacheEntry(str(row[0]), *row[1:])
+            fresh = time.time() - entry.stored_at < self.ttl_for(key[2])
+            if fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return entry, fresh
+
+    def serve_stale(self, key, entry):
+        if time.time() - entry.stored_at >= self.max_stale:
+            return False
+        with self._lock:
+            self.stale += 1
+        return True
+
+    def set(self, key, entry):
+        path = key[2]
+        if not self.ttl_for(path):
+            return
+        with self._lock, self._db:
+            self._db.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                self._key(key) + (resource_type(path), resource_uid(path), sqlite3.Binary(entry.content),
+                                  entry.encoding, entry.etag, entry.last_modified, entry.stored_at))
+
+    def touch(self, key):
+        with self._lock, self._db:
+            self._db.execute('UPDATE responses SET stored_at = ? WHERE api_url = ? AND api_key = ? AND path = ?',
+                             (time.time(),) + self._key(key))
+            self.revalidations += 1
+
+    def invalidate(self, prefix):
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM responses WHERE substr(path, 1, ?) = ?', (len(prefix), prefix))
+
+    def uids(self, resource_type):
+        """
+        Returns the uids of the cached resources of a type (e.g. 'nodes').
+        """
+        with self._lock:
+            rows = self._db.execute('SELECT DISTINCT uid FROM responses WHERE type = ? AND uid IS NOT NULL',
+                                    (resource_type,))
+            return [uid for uid, in rows]
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM responses')
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def stats(self):
+        with self._lock:
+            entries = self._db.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+        return {'entries': entries, 'hits': self.hits, 'misses': self.misses,
+                'stale': self.stale, 'revalidations': self.revalidations}
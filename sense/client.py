@@ -0,0 +1,360 @@
+import time
+import threading
+from copy import copy
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+import requests
+from requests.adapters import HTTPAdapter
+import utils
+from cache import CacheEntry
+from scheduler import Scheduler
+from identity import IdentityMap
+
+
+# Marks the worker threads of the executors (see `on_executor`)
+_workers = threading.local()
+
+
+def _mark_worker():
+    _workers.active = True
+
+
+def on_executor():
+    """
+    Returns True in the worker threads of a client executor, whose calls must not wait
+    for other tasks of the executor: they could be queued behind the waiting ones.
+    """
+    return getattr(_workers, 'active', False)
+
+
+class _Pool(object):
+    """
+    Connection pool and worker threads shared by a client and the clients derived from it.
+    """
+    def __init__(self):
+        self.session = None
+        self.executor = None
+        self.lock = threading.Lock()
+        # Cache keys being refreshed in the background
+        self.refreshing = set()
+
+
+class Client(object):
+    """
+    Holds a pooled `requests.Session` reused by every request made through it, so
+    consecutive calls share keep-alive connections instead of paying a new TCP/TLS
+    handshake each time. A client can be shared between threads.
+
+    Settings left to `None` (api_url, api_key, app_secret, user_agent) are read from
+    the `sense` module globals at request time, which is how the default client
+    behaves.
+
+    >>> import sense
+    >>> sense.default_client = sense.Client(api_key='{{ api_key }}', pool_maxsize=20, max_retries=3)
+    >>> sense.Node.retrieve('{{ node.uid }}')
+
+    GET responses are cached when a `cache` is given (see `sense.cache`). Requests are
+    rate limited and retried by the client `scheduler` (see `sense.scheduler`).
+    With `identity_map`, the nodes, feeds and subscriptions it decodes are shared per
+    uid (see `sense.identity`).
+    """
+
+    def __init__(self, api_url=None, api_key=None, app_secret=None, user_agent=None,
+                 pool_connections=10, pool_maxsize=10, max_retries=0, pool_block=False,
+                 keep_alive=True, cache=None, scheduler=None, identity_map=False):
+        self.api_url = api_url
+        self.api_key = api_key
+        self.app_secret = app_secret
+        self.user_agent = user_agent
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.max_retries = max_retries
+        self.pool_block = pool_block
+        self.keep_alive = keep_alive
+        self.cache = cache
+        self.scheduler = scheduler if scheduler is not None else Scheduler()
+        self.identity_map = IdentityMap() if identity_map else None
+        # Token auth of the requests, built from the settings when None
+        self.auth = None
+        # Callbacks receiving a dict describing each request of the resource classes
+        # (see `sense.metrics`), before it is sent and once it is decoded
+        self.on_request = []
+        self.on_response = []
+        self._pool = _Pool()
+
+    @property
+    def session(self):
+        pool = self._pool
+        if pool.session is None:
+            with pool.lock:
+                if pool.session is None:
+                    pool.session = self._make_session()
+        return pool.session
+
+    @property
+    def executor(self):
+        """
+        Worker threads (as many as `pool_maxsize`) used to send concurrent requests.
+        """
+        pool = self._pool
+        if pool.executor is None:
+            with pool.lock:
+                if pool.executor is None:
+                    pool.executor = ThreadPool(self.pool_maxsize, _mark_worker)
+        return pool.executor
+
+    def _make_session(self):
+        s = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                              pool_maxsize=self.pool_maxsize,
+                              max_retries=self.max_retries,
+                              pool_block=self.pool_block)
+        s.mount('https://', adapter)
+        s.mount('http://', adapter)
+        if not self.keep_alive:
+            s.headers['Connection'] = 'close'
+        return s
+
+    def settings(self):
+        """
+        Returns the (api_url, api_key, app_secret, user_agent) used by this client,
+        falling back on the `sense` module globals.
+        """
+        from . import api_url, api_key, app_secret, user_agent
+        return (self.api_url if self.api_url is not None else api_url,
+                self.api_key if self.api_key is not None else api_key,
+                self.app_secret if self.app_secret is not None else app_secret,
+                self.user_agent if self.user_agent is not None else user_agent)
+
+    def derive(self, **settings):
+        """
+        Returns a copy of this client with some settings overridden (e.g. api_key)
+        that keeps sharing the same connection pool. Other credentials get their own
+        identity map.
+        """
+        client = copy(self)
+        for k, v in settings.items():
+            setattr(client, k, v)
+        if client.settings()[:3] != self.settings()[:3]:
+            client.auth = None
+            if self.identity_map is not None:
+                client.identity_map = IdentityMap()
+        return client
+
+    def request(self, method, url, **kwargs):
+        api_url, api_key, app_secret, user_agent = self.settings()
+        headers = {'User-Agent': user_agent}
+        headers.update(kwargs.pop('headers', None) or {})
+        kwargs.setdefault('auth', self.auth or utils.token_auth(api_key, app_secret))
+        if self.cache is None:
+            return self._send(method, url, headers=headers, **kwargs)
+
+        path = self._cache_path(api_url, url, kwargs.get('params'))
+        if method == 'GET':
+            return self._cached_get((api_url, api_key, path), url, headers, kwargs)
+        r = self._send(method, url, headers=headers, **kwargs)
+        if r.ok:
+            # Changes invalidate the collection holding the resource (or the one posted to)
+            path = path.split('?')[0]
+            if method != 'POST':
+                path = path.rstrip('/').rsplit('/', 1)[0] + '/'
+            self.cache.invalidate(path)
+        return r
+
+    def _send(self, method, url, **kwargs):
+        data = kwargs.get('data')
+        if isinstance(data, dict):
+            # Retries encode the body again, iterators (e.g. `filter_feeds`) would be exhausted
+            kwargs['data'] = dict((k, v if isinstance(v, (basestring, list, tuple, dict)) or not hasattr(v, '__iter__')
+                                   else list(v)) for k, v in data.iteritems())
+        return self.scheduler.send(method, lambda: self.session.request(method, url, **kwargs))
+
+    @staticmethod
+    def _cache_path(api_url, url, params):
+        p = requests.models.PreparedRequest()
+        p.prepare_url(url, params)
+        return p.url[len(api_url):] if p.url.startswith(api_url) else p.url
+
+    def _cached_get(self, key, url, headers, kwargs):
+        entry, fresh = self.cache.get(key)
+        if entry is not None:
+            if fresh:
+                return _cached_response(url, entry)
+            if self.cache.serve_stale(key, entry):
+                self._refresh_in_background(key, url, headers, kwargs, entry)
+                return _cached_response(url, entry)
+        return self._fetch(key, url, headers, kwargs, entry)
+
+    def _refresh_in_background(self, key, url, headers, kwargs, entry):
+        pool = self._pool
+        with pool.lock:
+            if key in pool.refreshing:
+                return
+            pool.refreshing.add(key)
+
+        def refresh():
+            try:
+                self._fetch(key, url, headers, kwargs, entry)
+            finally:
+                with pool.lock:
+                    pool.refreshing.discard(key)
+        self.executor.apply_async(refresh)
+
+    def _fetch(self, key, url, headers, kwargs, entry=None):
+        """
+        GET `url` and cache the response, revalidating the expired `entry` if given.
+        """
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+
+        r = self._send('GET', url, headers=headers, **kwargs)
+        if r.status_code == 304 and entry is not None:
+            self.cache.touch(key)
+            return _cached_response(url, entry)
+        if r.status_code == 200:
+            self.cache.set(key, CacheEntry(r.content, r.encoding, r.headers.get('ETag'),
+                                           r.headers.get('Last-Modified'), time.time()))
+        return r
+
+    def invalidate(self, path):
+        """
+        Drop the cached responses of the urls (relative to the api url) starting with `path`.
+        """
+        if self.cache is not None:
+            self.cache.invalidate(path)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+    def map(self, func, items, concurrency=None):
+        """
+        Calls `func` on each item using the client executor, or `concurrency` dedicated
+        threads (keep it below `pool_maxsize` to reuse every connection). Called from
+        a thread of the executor, `pool_maxsize` dedicated threads are used instead.
+        Returns a `utils.BulkResult` per item, in the order of `items`.
+        """
+        def call(item):
+            try:
+                return utils.BulkResult(item, func(item), None)
+            except Exception, err:
+                return utils.BulkResult(item, None, err)
+        if concurrency is None and not on_executor():
+            return self.executor.map(call, items)
+        workers = ThreadPool(concurrency or self.pool_maxsize, _mark_worker)
+        try:
+            return workers.map(call, items)
+        finally:
+            workers.close()
+
+    def close(self):
+        pool = self._pool
+        with pool.lock:
+            if pool.session is not None:
+                pool.session.close()
+                pool.session = None
+            if pool.executor is not None:
+                pool.executor.close()
+                pool.executor = None
+
+
+class ClientPool(object):
+    """
+    Clients of the many accounts (tenants) served by one process, one per set of
+    credentials. They are derived from a single `Client` built with `client_options`,
+    so every tenant sends its requests over the same pooled connections, and each
+    keeps its token auth and its own scheduler (`limits` are the `Scheduler` options
+    of every tenant, overridden by those given to `get`). The least recently used
+    tenants are dropped beyond `max_clients`.
+
+    >>> import sense
+    >>> tenants = sense.ClientPool(max_clients=500, pool_maxsize=50, limits={'rate': 5, 'burst': 10})
+    >>> client = tenants.get('{{ api_key }}')
+    >>> sense.Node.list(client=client)
+    >>> sense.Node.all(client=tenants.get('{{ other_api_key }}', rate=20))
+    """
+
+    def __init__(self, max_clients=256, limits=None, **client_options):
+        self.max_clients = max_clients
+        self.limits = limits or {}
+        self.base = Client(**client_options)
+        self.hits = self.misses = self.evictions = 0
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._clients)
+
+    def get(self, api_key, app_secret=None, api_url=None, **limits):
+        """
+        Returns the client of a tenant, created with the `Scheduler` options `limits`
+        the first time it is requested (or after it was dropped).
+        """
+        key = (api_url, api_key, app_secret)
+        with self._lock:
+            client = self._clients.pop(key, None)
+            if client is not None:
+                self.hits += 1
+                self._clients[key] = client
+                return client
+            self.misses += 1
+            settings = {'api_key': api_key, 'app_secret': app_secret}
+            if api_url is not None:
+                settings['api_url'] = api_url
+            client = self.base.derive(**settings)
+            client.scheduler = Scheduler(**dict(self.limits, **limits))
+            client.auth = utils.SenseTokenAuth(api_key, app_secret)
+            self._clients[key] = client
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+                self.evictions += 1
+            return client
+
+    def discard(self, api_key, app_secret=None, api_url=None):
+        with self._lock:
+            self._clients.pop((api_url, api_key, app_secret), None)
+
+    def stats(self):
+        with self._lock:
+            return {'clients': len(self._clients), 'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions}
+
+    def close(self):
+        """
+        Close the connections shared by the clients of every tenant.
+        """
+        with self._lock:
+            self._clients.clear()
+        self.base.close()
+
+
+def _cached_response(url, entry):
+    r = requests.Response()
+    r._content = entry.content
+    r.encoding = entry.encoding
+    r.status_code = 200
+    r.url = url
+    return r
+
+
+_default_client = Client()
+
+
+def get_default_client():
+    """
+    Returns `sense.default_client` when set, or a module wide client configured by
+    the `sense` globals.
+    """
+    from . import default_client
+    return default_client or _default_client
@@ -0,0 +1,184 @@
+"""
+Columnar export of events (see `Event.to_arrays` and `Event.to_dataframe`).
+
+Events are read from the json of the list pages without building an `Event` per row:
+the values of each page are gathered per column, with the nested `data` flattened
+into dotted keys (`data.value`, the values of `data` that are not objects staying in a
+`data` column), and converted to one numpy array per column and page. Dates become datetime64 arrays, numbers int64 or float64 arrays (NaN for the
+missing ones), other values object arrays.
+
+numpy (and pandas for `to_dataframe`) are optional dependencies of the client.
+"""
+from collections import OrderedDict
+import datetime
+import utils
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
+
+DATE_COLUMNS = frozenset(['dateEvent', 'dateServer'])
+DATE_DTYPE = 'datetime64[us]'
+NONE_TYPES = frozenset([type(None)])
+NUMBER_TYPES = frozenset([int, long, float, type(None)])
+
+
+def require(module, name):
+    if module is None:
+        raise ImportError('%s is needed to export events as columns, run `pip install %s`' % (name, name))
+
+
+class ColumnBuilder(object):
+    """
+    Accumulate pages of events (lists of json objects) into columns.
+    """
+
+    def __init__(self, fields=None):
+        require(numpy, 'numpy')
+        self.fields = frozenset(fields) if fields else None
+        self.rows = 0
+        # Column name -> [(first row, array)], pages without values for a column are left out
+        self.chunks = {}
+        self.names = set()
+
+    def add_page(self, events):
+        values = {}
+        self._gather(values, events, '')
+        for name, (column, types) in values.iteritems():
+            self.names.add(name)
+            if types != NONE_TYPES:
+                self.chunks.setdefault(name, []).append((self.rows, to_array(name, column, types)))
+        self.rows += len(events)
+
+    def extend(self, other):
+        """
+        Append the rows of another builder (e.g. built by a worker process).
+        """
+        for name in other.names:
+            self.names.add(name)
+            for start, array in other.chunks.get(name, ()):
+                self.chunks.setdefault(name, []).append((self.rows + start, array))
+        self.rows += other.rows
+
+    def _gather(self, values, objects, prefix):
+        """
+        Split `objects` (json objects) into `values`, one list per key, recursing into nested objects.
+        """
+        fields = self.fields
+        keys = set()
+        for o in objects:
+            keys.update(o)
+        for k in keys:
+            name = prefix + k
+            column = [o.get(k) for o in objects]
+            types = set(map(type, column))
+            if dict in types:
+                self._gather(values, [v if type(v) is dict else {} for v in column], name + '.')
+                types.discard(dict)
+                if types <= NONE_TYPES:
+                    continue
+                # Other values of the key are kept in its own column, missing where objects are
+                column = [None if type(v) is dict else v for v in column]
+                types.add(type(None))
+            if fields is None or name in fields:
+                values[name] = column, types
+
+    def arrays(self):
+        """
+        Returns an ordered dict of the columns, `dateEvent` first.
+        """
+        names = sorted(self.names, key=lambda name: (name != 'dateEvent', name))
+        return OrderedDict((name, self._concatenate(name, self.chunks.get(name))) for name in names)
+
+    def _concatenate(self, name, chunks):
+        if not chunks:
+            return to_array(name, [None] * self.rows, NONE_TYPES)
+        kinds = set(array.dtype.kind for _, array in chunks)
+        if len(kinds) > 1:
+            # Pages of different types (e.g. numbers and strings) are merged as objects
+            dtype = 'float64' if kinds <= set('if') else object
+            chunks = [(start, array.astype(dtype)) for start, array in chunks]
+        parts = []
+        row = 0
+        for start, array in chunks:
+            if start > row:
+                parts.append(missing(array.dtype, start - row))
+            parts.append(array)
+            row = start + len(array)
+        if row < self.rows:
+            parts.append(missing(chunks[-1][1].dtype, self.rows - row))
+        return numpy.concatenate(parts) if len(parts) > 1 else parts[0]
+
+
+def missing(dtype, n):
+    """
+    Array of `n` missing values for a column of `dtype`.
+    """
+    if dtype.kind == 'M':
+        return numpy.full(n, numpy.datetime64('NaT'), dtype=dtype)
+    if dtype.kind in 'if':
+        return numpy.full(n, numpy.nan)
+    return numpy.full(n, None, dtype=object)
+
+
+def to_array(name, values, types):
+    """
+    Convert a column holding values of `types` to an array.
+    """
+    if name in DATE_COLUMNS:
+        return to_datetime64(values)
+    if types == NONE_TYPES or not types <= NUMBER_TYPES:
+        if types == set([bool]):
+            return numpy.array(values, dtype=bool)
+        return object_array(values)
+    if float in types or type(None) in types:
+        # Missing values become NaN
+        return numpy.array(values, dtype='float64')
+    return numpy.array(values, dtype='int64')
+
+
+def object_array(values):
+    array = numpy.empty(len(values), dtype=object)
+    try:
+        array[:] = values
+    except ValueError:
+        # Lists of the same length would be read as a second dimension
+        for i, v in enumerate(values):
+            array[i] = v
+    return array
+
+
+def to_datetime64(values):
+    try:
+        return numpy.array([v if v is not None else 'NaT' for v in values], dtype=DATE_DTYPE)
+    except (ValueError, TypeError):
+        pass
+    # Formats numpy does not read, or dates with a time zone (converted to UTC)
+    dates = []
+    for v in values:
+        d = utils.parse_datetime(v) if v is not None else None
+        if d is not None and d.tzinfo is not None:
+            d = d.replace(tzinfo=None) - d.utcoffset()
+        dates.append(numpy.datetime64(d, 'us') if isinstance(d, datetime.datetime) else numpy.datetime64('NaT'))
+    return numpy.array(dates, dtype=DATE_DTYPE)
+
+
+def to_arrays(pages, fields=None):
+    """
+    Returns the columns of the events of `pages`, an iterable of lists of json objects.
+    """
+    builder = ColumnBuilder(fields)
+    for events in pages:
+        builder.add_page(events)
+    return builder.arrays()
+
+
+def to_dataframe(pages, fields=None):
+    require(pandas, 'pandas')
+    return pandas.DataFrame(to_arrays(pages, fields))
@@ -0,0 +1,74 @@
+"""
+Stream events to files without building the full list first.
+
+>>> import sense
+>>> from sense.export import write_ndjson, write_csv
+>>> sense.api_key = '{{ api_key }}'
+>>> feed = sense.Feed('{{ feed.uid }}')
+>>> with open('events.ndjson', 'w') as f:
+>>>     write_ndjson(feed.events.iter(start='2014-01-01', end='2014-04-01'), f)
+>>> with open('events.csv', 'wb') as f:
+>>>     write_csv(feed.events.iter(start='2014-01-01', end='2014-04-01'), f)
+"""
+import csv
+import json
+import datetime
+from collections import Mapping
+
+
+def _default(o):
+    if isinstance(o, (datetime.datetime, datetime.date)):
+        return o.isoformat()
+    if isinstance(o, Mapping):
+        return dict(o.items())
+    raise TypeError('%r is not JSON serializable' % (o,))
+
+
+def flatten(event, prefix=''):
+    """
+    Flatten nested mappings into a single dict with dotted keys (e.g. `data.key`).
+    """
+    flat = {}
+    for k, v in event.items():
+        if isinstance(v, Mapping):
+            flat.update(flatten(v, '%s%s.' % (prefix, k)))
+        else:
+            flat[prefix + k] = v
+    return flat
+
+
+def write_ndjson(events, fp):
+    """
+    Write one json object per line. Returns the number of events written.
+    """
+    n = 0
+    for n, event in enumerate(events, 1):
+        fp.write(json.dumps(event, default=_default))
+        fp.write('\n')
+    return n
+
+
+def write_csv(events, fp, fields=None):
+    """
+    Write flattened events as csv rows. Unless given, the columns are the keys of the
+    first event; keys missing from it are ignored. Returns the number of events written.
+    """
+    writer = None
+    n = 0
+    for n, event in enumerate(events, 1):
+        row = flatten(event)
+        if writer is None:
+            writer = csv.DictWriter(fp, fields or sorted(row), extrasaction='ignore')
+            writer.writeheader()
+        writer.writerow(dict((k, _csv_value(v)) for k, v in row.iteritems()))
+    return n
+
+
+def _csv_value(v):
+    if isinstance(v, (datetime.datetime, datetime.date)):
+        return v.isoformat()
+    if isinstance(v, unicode):
+        return v.encode('utf-8')
+    if isinstance(v, (list, tuple)):
+        return json.dumps(v, default=_default)
+    return v
@@ -0,0 +1,181 @@
+"""
+Receiver of the events pushed by Sen.se to the `gatewayUrl` of a subscription.
+
+`GatewayServer` is a threaded HTTP server keeping connections alive. Each POST is
+checked against the token of the credentials (the `Authorization: Token ...` header
+sent by `SenseTokenAuth`), its json body (an event or a list of events) is decoded
+into `Event` objects, which are handed to `callback` or put in a bounded queue. When
+the queue is full the request is refused with 503 and `Retry-After`, so the sender
+slows down instead of the receiver running out of memory.
+
+>>> import sense
+>>> from sense.gateway import GatewayServer
+>>> server = GatewayServer(('', 8000), api_key='{{ api_key }}', app_secret='{{ app_secret }}').start()
+>>> sense.Subscription.create(label='gateway', gatewayUrl='https://example.com:8000/', subscribes=['{{ feed.uid }}'])
+>>> for event in server:
+>>>     print event.feedUid, event.data
+"""
+import hmac
+import Queue
+import threading
+import BaseHTTPServer
+import SocketServer
+import utils
+import serializer
+from resources import Event
+
+# Largest accepted request body
+MAX_BODY_SIZE = 1024 * 1024
+
+
+def compare_digest(a, b):
+    """
+    Compare two strings in a time independent of their common prefix.
+    """
+    if hasattr(hmac, 'compare_digest'):
+        return hmac.compare_digest(a, b)
+    if len(a) != len(b):
+        return False
+    result = 0
+    for x, y in zip(a, b):
+        result |= ord(x) ^ ord(y)
+    return result == 0
+
+
+class GatewayHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        server = self.server
+        length = self.headers.get('Content-Length')
+        if length is None or not length.isdigit():
+            # The body left unread would be parsed as the next request
+            self.close_connection = 1
+            return self.respond(411)
+        if int(length) > server.max_body_size:
+            self.close_connection = 1
+            return self.respond(413)
+        content = self.rfile.read(int(length))
+
+        if not server.authorized(self.headers.get('Authorization')):
+            return server.count('unauthorized', self.respond(401))
+        try:
+            events = server.decode(content)
+        except (ValueError, TypeError, AttributeError):
+            return server.count('invalid', self.respond(400))
+        status = server.deliver(events)
+        self.respond(status, {'Retry-After': str(server.retry_after)} if status == 503 else None)
+
+    def respond(self, status, headers=None):
+        self.send_response(status)
+        for k, v in (headers or {}).iteritems():
+            self.send_header(k, v)
+        self.send_header('Content-Length', '0')
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        return status
+
+    def log_message(self, *args):
+        pass
+
+
+class GatewayServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+    Receive events on `address`. Without `callback` they are queued, up to `queue_size`
+    events, and read with `get` or by iterating over the server. A callback is called
+    from the request threads, its exceptions are answered with 500 so the events are sent again.
+
+    Requests must carry the token of `api_key` and `app_secret` (defaulting to `sense.api_key`
+    and `sense.app_secret`), unless `verify` is False.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=('', 8000), api_key=None, app_secret=None, callback=None,
+                 queue_size=10000, retry_after=1, max_body_size=MAX_BODY_SIZE, verify=True):
+        from . import api_key as default_api_key, app_secret as default_app_secret
+        api_key = api_key or default_api_key
+        if verify and not api_key:
+            raise ValueError('GatewayServer needs an api_key to verify requests, or verify=False')
+        self.token = utils.token(api_key, app_secret or default_app_secret) if verify else None
+        self.callback = callback
+        self.queue = Queue.Queue(queue_size)
+        self.retry_after = retry_after
+        self.max_body_size = max_body_size
+        self.received = self.rejected = self.unauthorized = self.invalid = 0
+        self._lock = threading.Lock()
+        BaseHTTPServer.HTTPServer.__init__(self, address, GatewayHandler)
+
+    def authorized(self, header):
+        if self.token is None:
+            return True
+        scheme, _, token = (header or '').strip().partition(' ')
+        return scheme == 'Token' and compare_digest(token.strip(), self.token)
+
+    def decode(self, content):
+        values = serializer.loads(content)
+        if isinstance(values, dict):
+            values = [values]
+        return [Event.construct_from(v) for v in values]
+
+    def deliver(self, events):
+        """
+        Hand `events` to the callback or queue them all, returns the response status.
+        """
+        if self.callback is not None:
+            try:
+                for event in events:
+                    self.callback(event)
+            except Exception:
+                return self.count('rejected', 500)
+            return self.count('received', 204, len(events))
+
+        with self._lock:
+            # Only the request threads add to the queue: once there is room for every
+            # event of the request, putting them does not block
+            if self.queue.maxsize and self.queue.qsize() + len(events) > self.queue.maxsize:
+                self.rejected += len(events)
+                return 503
+            for event in events:
+                self.queue.put_nowait(event)
+            self.received += len(events)
+        return 204
+
+    def count(self, counter, status, n=1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + n)
+        return status
+
+    def get(self, timeout=None):
+        """
+        Returns the next queued event, raises `Queue.Empty` after `timeout` seconds.
+        """
+        return self.queue.get(timeout=timeout)
+
+    def __iter__(self):
+        while True:
+            # A timeout keeps the wait interruptible
+            try:
+                yield self.queue.get(timeout=3600)
+            except Queue.Empty:
+                pass
+
+    def start(self):
+        """
+        Serve from a daemon thread.
+        """
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def stats(self):
+        return {'received': self.received, 'rejected': self.rejected, 'unauthorized': self.unauthorized,
+                'invalid': self.invalid, 'queued': self.queue.qsize()}
@@ -0,0 +1,119 @@
+"""
+Identity map of the resources decoded through a client (see `Client(identity_map=True)`).
+
+Nodes, feeds and subscriptions are keyed by (class, uid), so that a uid resolves to
+a single shared instance: the feeds repeated in the `subscribes` and `publishes` of
+every node of a page, or the nodes nested in an expanded user, are decoded once.
+
+Invalidation policy:
+
+    * the map holds weak references, an instance is forgotten as soon as the
+      application no longer references it,
+    * every response holding an object updates its shared instance in place with the
+      keys it carries (keys missing from a partial representation, e.g. a feed nested
+      in a node, are kept): the last response wins,
+    * within a response, repeated representations of a uid are not decoded again,
+    * `delete()` drops the instance from the map, and `invalidate` or `clear` drop
+      entries explicitly so the next response builds a fresh instance.
+
+Clients derived with other credentials (`Client.derive`) get their own map. Objects
+decoded later by `sense.lazy_decode`, or built as records by `sense.compact_resources`,
+are not shared.
+
+>>> import sense
+>>> sense.default_client = sense.Client(identity_map=True)
+>>> user = sense.User.retrieve(expand=['devices'])
+>>> assert user.devices[0] is sense.Node.retrieve(user.devices[0].uid)
+"""
+import weakref
+import threading
+
+_local = threading.local()
+
+
+def current():
+    """
+    Returns the `IdentityMap` of the response being decoded by this thread, or None.
+    """
+    return getattr(_local, 'decoding', None)
+
+
+class IdentityMap(object):
+
+    def __init__(self):
+        self._instances = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+        # Keys decoded from the current response of this thread
+        self._seen = threading.local()
+
+    def __len__(self):
+        return len(self._instances)
+
+    def decoding(self):
+        """
+        Context in which the responses are decoded through this map.
+        """
+        return _Decoding(self)
+
+    def lookup(self, cls, uid):
+        """
+        Returns the (instance, seen) pair of a uid: its shared instance or None, and
+        whether it was already decoded from the current response.
+        """
+        key = (cls, uid)
+        return self._instances.get(key), key in self._seen.keys
+
+    def add(self, cls, uid, instance):
+        """
+        Share `instance`, decoded from the current response, for the uid.
+        """
+        key = (cls, uid)
+        with self._lock:
+            self._instances[key] = instance
+        self._seen.keys.add(key)
+
+    def seen(self, cls, uid):
+        self._seen.keys.add((cls, uid))
+
+    def invalidate(self, cls, uid):
+        with self._lock:
+            self._instances.pop((cls, uid), None)
+
+    def clear(self):
+        with self._lock:
+            self._instances.clear()
+
+
+class _Decoding(object):
+
+    def __init__(self, identity_map):
+        self.identity_map = identity_map
+
+    def __enter__(self):
+        self.previous = (current(), getattr(self.identity_map._seen, 'keys', None))
+        _local.decoding = self.identity_map
+        self.identity_map._seen.keys = set()
+        return self.identity_map
+
+    def __exit__(self, *exc_info):
+        _local.decoding, self.identity_map._seen.keys = self.previous
+
+
+class _NoMap(object):
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc_info):
+        pass
+
+NO_MAP = _NoMap()
+
+
+def decoding(client):
+    """
+    Context decoding a response received by `client`.
+    """
+    if client.identity_map is None:
+        return NO_MAP
+    return client.identity_map.decoding()
@@ -0,0 +1,150 @@
+"""
+Request metrics of a `sense.Client`.
+
+The hooks of a client (`on_request`, `on_response`) are called with a dict describing
+each request sent by the resource classes::
+
+    {'resource': sense.Node, 'method': 'GET', 'url_template': '/nodes/{uid}/',
+     'status': 200, 'bytes': 1523,
+     'timings': {'prepare': ..., 'network': ..., 'json': ..., 'decode': ...}}
+
+plus an 'error' key when the request failed, 'resource' being the resource class. A
+client without hooks skips this bookkeeping entirely.
+
+`MetricsCollector` is such a hook aggregating counters and histograms of the timings:
+
+>>> import sense
+>>> metrics = sense.MetricsCollector().install(sense.default_client)
+>>> sense.Node.list()
+>>> metrics.to_dict()
+>>> print metrics.to_prometheus()
+"""
+import threading
+from bisect import bisect_left
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def resource_label(resource):
+    """
+    Name of a resource class in the metrics.
+    """
+    return getattr(resource, '__name__', None) or str(resource)
+
+
+def escape_label(value):
+    """
+    Escape a label value of the Prometheus text format.
+    """
+    if not isinstance(value, basestring):
+        value = str(value)
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Histogram(object):
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for le, n in zip(self.buckets + (float('inf'),), self.counts):
+            total += n
+            yield le, total
+
+
+class MetricsCollector(object):
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.requests = {}
+        self.errors = {}
+        self.bytes = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def install(self, client):
+        client.on_response.append(self)
+        return self
+
+    def __call__(self, info):
+        key = (resource_label(info['resource']), info['method'], info['url_template'])
+        with self._lock:
+            status_key = key + (str(info['status']),)
+            self.requests[status_key] = self.requests.get(status_key, 0) + 1
+            self.bytes[key] = self.bytes.get(key, 0) + info['bytes']
+            if 'error' in info:
+                self.errors[key] = self.errors.get(key, 0) + 1
+            for phase, seconds in info['timings'].iteritems():
+                histogram = self.histograms.get(key + (phase,))
+                if histogram is None:
+                    histogram = self.histograms[key + (phase,)] = Histogram(self.buckets)
+                histogram.observe(seconds)
+
+    def reset(self):
+        with self._lock:
+            self.requests.clear()
+            self.errors.clear()
+            self.bytes.clear()
+            self.histograms.clear()
+
+    def to_dict(self):
+        """
+        Returns the metrics as a list of requests series.
+        """
+        with self._lock:
+            series = {}
+            for (resource, method, template, status), n in self.requests.iteritems():
+                s = series.setdefault((resource, method, template), {
+                    'resource': resource, 'method': method, 'url_template': template,
+                    'requests': {}, 'errors': 0, 'bytes': 0, 'timings': {}})
+                s['requests'][status] = n
+            for key, s in series.iteritems():
+                s['errors'] = self.errors.get(key, 0)
+                s['bytes'] = self.bytes.get(key, 0)
+            for key, h in self.histograms.iteritems():
+                series[key[:3]]['timings'][key[3]] = {
+                    'count': h.count, 'sum': h.sum,
+                    'buckets': [(le, n) for le, n in h.cumulative()]}
+            return sorted(series.values(), key=lambda s: (s['resource'], s['method'], s['url_template']))
+
+    def to_prometheus(self, prefix='sense_client'):
+        """
+        Returns the metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        series = self.to_dict()
+
+        def labels(s, *extra):
+            pairs = [('resource', s['resource']), ('method', s['method']),
+                     ('url_template', s['url_template'])] + list(extra)
+            return '{%s}' % ','.join('%s="%s"' % (k, escape_label(v)) for k, v in pairs)
+
+        lines.append('# TYPE %s_requests_total counter' % prefix)
+        for s in series:
+            for status, n in sorted(s['requests'].items()):
+                lines.append('%s_requests_total%s %d' % (prefix, labels(s, ('status', status)), n))
+        lines.append('# TYPE %s_errors_total counter' % prefix)
+        for s in series:
+            lines.append('%s_errors_total%s %d' % (prefix, labels(s), s['errors']))
+        lines.append('# TYPE %s_response_bytes_total counter' % prefix)
+        for s in series:
+            lines.append('%s_response_bytes_total%s %d' % (prefix, labels(s), s['bytes']))
+        lines.append('# TYPE %s_phase_seconds histogram' % prefix)
+        for s in series:
+            for phase, h in sorted(s['timings'].items()):
+                for le, n in h['buckets']:
+                    le = '+Inf' if le == float('inf') else repr(le)
+                    lines.append('%s_phase_seconds_bucket%s %d' % (prefix, labels(s, ('phase', phase), ('le', le)), n))
+                lines.append('%s_phase_seconds_sum%s %r' % (prefix, labels(s, ('phase', phase)), h['sum']))
+                lines.append('%s_phase_seconds_count%s %d' % (prefix, labels(s, ('phase', phase)), h['count']))
+        return '\n'.join(lines) + '\n'
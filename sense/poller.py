@@ -0,0 +1,260 @@
+"""
+Follow the new events of many feeds.
+
+`FeedPoller` lists the latest events of each feed at its own interval, from a fixed
+number of worker threads sending their requests through the pooled default client
+(keep `concurrency` below its `pool_maxsize`). Feeds returning new events are polled
+more often, down to `min_interval`, quiet or failing feeds less often, up to
+`max_interval`.
+
+Only the events dated after the last one seen for a feed are delivered, in order, as
+(feed, event) pairs to `callback` or to a bounded queue read by iterating over the
+poller. A full queue holds the workers back. When more than `limit` events arrived since
+the previous poll, the following pages are listed until they reach the events already
+seen. Without `since`, the first poll of a feed only records its latest event. When
+`callback` raises, the error is counted in `stats` and the events it did not receive
+are delivered at the next poll of the feed.
+
+>>> import sense
+>>> from sense.poller import FeedPoller
+>>> sense.api_key = '{{ api_key }}'
+>>> poller = FeedPoller(['{{ feed.uid }}', '{{ other_feed.uid }}'], interval=30, concurrency=8).start()
+>>> for feed, event in poller:
+>>>     print feed.uid, event.dateEvent, event.data
+"""
+import time
+import heapq
+import Queue
+import itertools
+import threading
+from multiprocessing.pool import ThreadPool
+import utils
+from resources import Feed, ListAPIResource
+
+
+class _FeedState(object):
+    __slots__ = ('feed', 'interval', 'due', 'last', 'removed')
+
+    def __init__(self, feed, interval, last):
+        self.feed = feed
+        self.interval = interval
+        self.due = time.time()
+        self.last = last
+        self.removed = False
+
+
+class FeedPoller(object):
+
+    def __init__(self, feeds=(), interval=60, min_interval=None, max_interval=None, backoff=2.0,
+                 concurrency=8, limit=20, since=None, callback=None, queue_size=10000):
+        self.interval = interval
+        self.min_interval = min_interval if min_interval is not None else interval / 4.0
+        self.max_interval = max_interval if max_interval is not None else interval * 8.0
+        self.backoff = backoff
+        self.concurrency = concurrency
+        self.limit = limit
+        self.since = utils.parse_datetime(since) if isinstance(since, basestring) else since
+        self.callback = callback
+        self.queue = Queue.Queue(queue_size)
+        self.polls = self.delivered = self.errors = 0
+        self._states = {}
+        self._heap = []
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+        self._running = False
+        self._workers = None
+        for feed in feeds:
+            self.add(feed)
+
+    def add(self, feed, interval=None):
+        """
+        Follow `feed`, a `Feed` or a feed uid, every `interval` seconds (the default interval
+        of the poller otherwise).
+        """
+        if not isinstance(feed, Feed):
+            feed = Feed(feed)
+        state = _FeedState(feed, interval or self.interval, self.since)
+        with self._cond:
+            previous = self._states.get(feed.instance_url())
+            if previous is not None:
+                previous.removed = True
+            self._states[feed.instance_url()] = state
+            self._push(state)
+
+    def remove(self, feed):
+        if not isinstance(feed, Feed):
+            feed = Feed(feed)
+        with self._cond:
+            state = self._states.pop(feed.instance_url(), None)
+            if state is not None:
+                state.removed = True
+
+    def intervals(self):
+        """
+        Returns the current polling interval of each feed, by feed url.
+        """
+        with self._cond:
+            return dict((key, state.interval) for key, state in self._states.iteritems())
+
+    def poll(self, state):
+        """
+        List the latest events of a feed, deliver the new ones and adapt its interval.
+        Returns the number of events delivered.
+        """
+        params = {'limit': self.limit}
+        if state.last is not None:
+            params['start'] = utils.isoformat(state.last)
+        first_poll = state.last is None
+        events = []
+        try:
+            page = state.feed.events.list(**params)
+            while page is not None:
+                objects = page.get('objects') or []
+                dates = []
+                for event in objects:
+                    date = event.get('dateEvent')
+                    if date is not None:
+                        dates.append(utils.parse_datetime(date))
+                        events.append((dates[-1], event))
+                # A full page may be followed by events not seen yet, unless it reached them
+                if (first_poll or len(objects) < self.limit or not isinstance(page, ListAPIResource) or
+                        (state.last is not None and dates and min(dates) <= state.last)):
+                    break
+                page = page.next()
+        except Exception:
+            with self._cond:
+                self.errors += 1
+                state.interval = min(self.max_interval, state.interval * self.backoff)
+            return 0
+
+        events.sort(key=lambda e: e[0])
+        if state.last is not None:
+            events = [e for e in events if e[0] > state.last]
+        if first_poll:
+            if events:
+                state.last = events[-1][0]
+            events = []
+
+        # The last event moves with each delivery, a failing callback gets the others next time
+        delivered = 0
+        failed = True
+        try:
+            for date, event in events:
+                if self.callback is not None:
+                    self.callback(state.feed, event)
+                else:
+                    self.queue.put((state.feed, event))
+                state.last = date
+                delivered += 1
+            failed = False
+        finally:
+            with self._cond:
+                self.polls += 1
+                self.delivered += delivered
+                if failed:
+                    self.errors += 1
+                elif events:
+                    state.interval = max(self.min_interval, state.interval / self.backoff)
+                elif not first_poll:
+                    state.interval = min(self.max_interval, state.interval * self.backoff)
+        return delivered
+
+    def run_pending(self):
+        """
+        Poll the feeds that are due from the calling thread. Returns the number of events delivered.
+        Errors of `callback` are raised once the feeds are scheduled again.
+        """
+        delivered = 0
+        due = self._pop_due()
+        try:
+            while due:
+                state = due.pop(0)
+                try:
+                    delivered += self.poll(state)
+                finally:
+                    self._reschedule(state)
+        finally:
+            # Feeds not polled yet stay due
+            for state in due:
+                self._push(state)
+        return delivered
+
+    def _pop_due(self):
+        now = time.time()
+        due = []
+        with self._cond:
+            while self._heap and self._heap[0][0] <= now:
+                state = heapq.heappop(self._heap)[2]
+                if not state.removed:
+                    due.append(state)
+        return due
+
+    def _reschedule(self, state):
+        with self._cond:
+            state.due = time.time() + state.interval
+            self._push(state)
+
+    def _push(self, state):
+        with self._cond:
+            if state.removed:
+                return
+            heapq.heappush(self._heap, (state.due, next(self._order), state))
+            self._cond.notify()
+
+    def _poll_and_reschedule(self, state):
+        try:
+            self.poll(state)
+        finally:
+            self._reschedule(state)
+
+    def start(self):
+        """
+        Poll from `concurrency` worker threads until `stop` is called.
+        """
+        with self._cond:
+            if self._running:
+                return self
+            self._running = True
+            self._workers = ThreadPool(self.concurrency)
+        thread = threading.Thread(target=self._run)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and (not self._heap or self._heap[0][0] > time.time()):
+                    self._cond.wait(self._heap[0][0] - time.time() if self._heap else None)
+                # The workers are closed and dropped by `stop`
+                if not self._running or self._workers is None:
+                    return
+                for state in self._pop_due():
+                    self._workers.apply_async(self._poll_and_reschedule, (state,))
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+            workers, self._workers = self._workers, None
+        if workers is not None:
+            workers.close()
+
+    def get(self, timeout=None):
+        """
+        Returns the next (feed, event) pair, raises `Queue.Empty` after `timeout` seconds.
+        """
+        return self.queue.get(timeout=timeout)
+
+    def __iter__(self):
+        while True:
+            # A timeout keeps the wait interruptible
+            try:
+                yield self.queue.get(timeout=3600)
+            except Queue.Empty:
+                pass
+
+    def stats(self):
+        with self._cond:
+            return {'feeds': len(self._states), 'polls': self.polls, 'delivered': self.delivered,
+                    'errors': self.errors, 'queued': self.queue.qsize()}
@@ -0,0 +1,131 @@
+"""
+Compact, read-only representation of resources (see `sense.compact_resources`).
+
+Each (resource class, set of keys) gets its own record class storing the values in
+`__slots__`: a record is much smaller than the equivalent `APIResource` dict and
+reading an attribute is a plain slot lookup. Records are still mappings, and
+`to_resource` returns the equivalent `APIResource`.
+"""
+import re
+from collections import Mapping
+
+# Above this number of record classes, objects with new sets of keys are kept as dicts
+MAX_RECORD_CLASSES = 256
+
+_identifier = re.compile(r'^[A-Za-z][A-Za-z0-9_]*$')
+_classes = {}
+
+
+class Record(object):
+    __slots__ = ()
+    _fields = ()
+    _fieldset = frozenset()
+    resource_class = None
+
+    def __getitem__(self, k):
+        if k in self._fieldset:
+            return getattr(self, k)
+        raise KeyError(k)
+
+    def __setattr__(self, k, v):
+        raise TypeError('%s is read-only, use to_resource() to get a mutable copy' % type(self).__name__)
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __contains__(self, k):
+        return k in self._fieldset
+
+    def __eq__(self, other):
+        if isinstance(other, Mapping):
+            return dict(self.iteritems()) == dict(other.items())
+        return NotImplemented
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __str__(self):
+        if 'uid' in self._fieldset:
+            return self.uid
+        return repr(self)
+
+    def __repr__(self):
+        return '<%s %r>' % (type(self).__name__, dict(self.iteritems()))
+
+    def __reduce__(self):
+        return construct_record, (self.resource_class, dict(self.iteritems()))
+
+    def has_key(self, k):
+        return k in self._fieldset
+
+    def get(self, k, default=None):
+        if k in self._fieldset:
+            return getattr(self, k)
+        return default
+
+    def keys(self):
+        return list(self._fields)
+
+    def iterkeys(self):
+        return iter(self._fields)
+
+    def itervalues(self):
+        for k in self._fields:
+            yield getattr(self, k)
+
+    def values(self):
+        return list(self.itervalues())
+
+    def iteritems(self):
+        for k in self._fields:
+            yield k, getattr(self, k)
+
+    def items(self):
+        return list(self.iteritems())
+
+    def to_resource(self):
+        resource = self.resource_class()
+        resource.update(self.iteritems())
+        return resource
+
+Mapping.register(Record)
+
+
+def record_class(resource_class, fields):
+    """
+    Returns the record class of `resource_class` objects holding `fields`, or None when
+    the fields can not be slots.
+    """
+    key = (resource_class, fields)
+    klass = _classes.get(key)
+    if klass is not None or len(_classes) >= MAX_RECORD_CLASSES:
+        return klass
+    reserved = dir(Record)
+    if not all(_identifier.match(f) and f not in reserved for f in fields):
+        return None
+    klass = type('%sRecord' % resource_class.__name__, (Record,), {
+        '__slots__': fields,
+        '_fields': fields,
+        '_fieldset': frozenset(fields),
+        'resource_class': resource_class,
+    })
+    return _classes.setdefault(key, klass)
+
+
+def construct_record(resource_class, values):
+    """
+    Returns a record holding the (already converted) `values`, or None when they do
+    not fit in a record.
+    """
+    klass = record_class(resource_class, tuple(sorted(values)))
+    if klass is None:
+        return None
+    record = object.__new__(klass)
+    for k, v in values.iteritems():
+        object.__setattr__(record, k, v)
+    return record
@@ -1,9 +1,21 @@
 import urllib
-from copy import copy
-import requests
-from dateutil import parser
+from functools import partial
+from collections import deque
 import utils
-import json
+import records
+import serializer
+import identity
+from timeit import default_timer as timer
+from client import get_default_client, on_executor
+
+DATE_KEYS = frozenset(['updatedAt', 'createdAt', 'start', 'end'])
+# Keys kept by a field selection, needed to build and address resources
+KEPT_FIELDS = frozenset(['object', 'uid'])
+# Accessors cached in the instances, bound to them (see `Node.feeds` and `Feed.events`)
+ACCESSORS = frozenset(['_feeds', '_events'])
+# Settings of the client of the following pages, kept when a page is pickled
+CLIENT_SETTINGS = ('api_url', 'api_key', 'app_secret')
+JSON_HEADERS = {'Content-Type': 'application/json'}
 
 def convert_to_sense_object(k, v):
     """
@@ -14,20 +26,19 @@ def convert_to_sense_object(k, v):
     :param v: object
     :return: object
     """
-    dates = ['updatedAt', 'createdAt', 'start', 'end']
-    types = {'node': Node, 'feed': Feed, 'user': User,
-             'subscription': Subscription, 'list': ListAPIResource}
-
-    if k in dates:
-        return parser.parse(v)
+    if k in DATE_KEYS:
+        return utils.parse_datetime(v)
 
     elif isinstance(v, list):
         return [convert_to_sense_object(k, e) for e in v]
 
     elif isinstance(v, dict):
+        if isinstance(v, APIResource):
+            # Already built while parsing (see object_hook)
+            return v
         klass_name = v.get('object')
         if isinstance(klass_name, basestring):
-            klass = types.get(klass_name, APIResource)
+            klass = RESOURCE_TYPES.get(klass_name, APIResource)
         else:
             klass = APIResource
         return klass.construct_from(v)
@@ -35,9 +46,96 @@ def convert_to_sense_object(k, v):
     else:
         return v
 
+def object_hook(values):
+    """
+    Build the resource of a json object as soon as it is parsed: its nested objects are
+    already resources, only its dates are left to convert. Same result as
+    `convert_to_sense_object` in a single pass.
+    """
+    for k in DATE_KEYS.intersection(values):
+        values[k] = utils.parse_datetime(values[k])
+    klass_name = values.get('object')
+    if isinstance(klass_name, basestring):
+        klass = RESOURCE_TYPES.get(klass_name, APIResource)
+    else:
+        klass = APIResource
+    identity_map = identity.current()
+    uid = values.get('uid')
+    if identity_map is not None and klass.interned and uid:
+        instance, seen = identity_map.lookup(klass, uid)
+        if instance is not None:
+            if not seen:
+                for k, v in values.iteritems():
+                    instance[k] = v
+                identity_map.seen(klass, uid)
+            return instance
+    instance = klass(values.get('id'))
+    dict.update(instance, values)
+    if identity_map is not None and klass.interned and uid:
+        identity_map.add(klass, uid, instance)
+    return instance
+
+def raw_json(values):
+    """
+    Decoder keeping the json values of a response as parsed, without building resources.
+    """
+    return values
+# Decoders receiving the parsed json rather than resources built while parsing
+raw_json.raw = True
+
+class FieldsDecoder(object):
+    """
+    Decoder of the responses requested with `fields`: only those keys of the object (of
+    each object of a page) are handed to `decode`, the others are dropped before any date
+    is parsed or nested resource built. `object` and `uid` are always kept.
+    """
+    raw = True
+
+    def __init__(self, fields, decode):
+        self.fields = KEPT_FIELDS.union(fields)
+        self.decode = decode
+
+    def select(self, values):
+        return dict((k, values[k]) for k in self.fields if k in values)
+
+    def __call__(self, values):
+        objects = values.get('objects')
+        if not isinstance(objects, list):
+            return self.decode(self.select(values))
+        page = self.decode(dict(values, objects=[self.select(o) if isinstance(o, dict) else o for o in objects]))
+        if isinstance(page, ListAPIResource):
+            # The following pages are selected alike
+            page._fields = self.fields
+        return page
+
+def select_fields(params, decode):
+    """
+    Returns the decoder of a request: `decode`, or a `FieldsDecoder` when a `fields` list
+    (or comma separated string) is in `params`. It is sent along (see `utils.expand`).
+    """
+    fields = params.get('fields') if params else None
+    if not fields:
+        return decode
+    if isinstance(fields, basestring):
+        fields = fields.split(',')
+    return FieldsDecoder(fields, decode)
+
+def loads_json(content, raw=False):
+    """
+    Decode a response body. Unless lazy or compact decoding is enabled, resources are
+    built while parsing when the json backend allows it (see `sense.serializer`).
+    """
+    from . import lazy_decode, compact_resources
+    if raw or lazy_decode or compact_resources:
+        return serializer.loads(content)
+    return serializer.loads(content, object_hook=object_hook)
+
+def needs_conversion(k, v):
+    return k in DATE_KEYS or isinstance(v, (list, dict))
+
 def filter_feeds(feeds):
     for f in feeds:
-        if isinstance(f, Feed):
+        if isinstance(f, (Feed, records.Record)):
             yield f.uid
         elif isinstance(f, basestring):
             yield f
@@ -45,26 +143,141 @@ def filter_feeds(feeds):
 def prepare_request(params=None):
     """
     This allows each functions using requests to override auth parameters.
+    Requests are sent through the pooled default client (see `sense.Client`), or the
+    `client` parameter (e.g. a tenant of a `sense.ClientPool`).
     """
 
     # Find and remove request settings from the parameters
-    from . import api_url, api_key, app_secret, user_agent
-    if params and 'api_url' in params:
-        api_url = params.pop('api_url')
-    if params and 'api_key' in params:
-        api_key = params.pop('api_key')
-    if params and 'app_secret' in params:
-        app_secret = params.pop('app_secret')
+    client = params.pop('client', None) if params else None
+    if client is None:
+        client = get_default_client()
+    overrides = {}
+    for k in ('api_url', 'api_key', 'app_secret'):
+        if params and k in params:
+            overrides[k] = params.pop(k)
+    if overrides:
+        client = client.derive(**overrides)
+
+    return client, client.settings()[0], params
+
 
-    # Make a session
-    s = requests.Session()
-    s.auth = utils.SenseTokenAuth(api_key, app_secret)
-    s.headers.update({'User-Agent': user_agent})
+def convert_json(values):
+    return convert_to_sense_object(None, values)
 
-    return s, api_url, params
+def api_request(resource, method, path, params=None, decode=None, json_body=False, **kwargs):
+    """
+    Send a request about `resource` (a class) to `path`, relative to the api url or absolute.
+    `params` go to the query string of GET requests and to the body of the others (json
+    encoded with `json_body`), once the request settings are removed by `prepare_request`.
+    Returns `decode(json)` of the response, or None.
+    """
+    started = timer()
+    s, api_url, params = prepare_request(params)
+    if method == 'GET':
+        kwargs['params'] = utils.expand(params or {})
+    elif json_body:
+        kwargs.update(data=serializer.dumps(params), headers=JSON_HEADERS)
+    else:
+        kwargs['data'] = params
+    url = path if '://' in path else api_url + path
+    result = send_request(s, resource, method, url, decode, started, **kwargs)
+    if isinstance(result, ListAPIResource) and s is not get_default_client():
+        # The following pages are requested through the same client
+        result._client = s
+    return result
+
+def send_request(s, resource, method, url, decode=None, started=None, **kwargs):
+    """
+    Send a request through the client `s`. When the client has hooks (see
+    `Client.on_request`), they receive the duration of each phase of the request.
+    """
+    if s.on_request or s.on_response:
+        return _instrumented_request(s, resource, method, url, decode, started, kwargs)
+    r = s.request(method, url, **kwargs)
+    r.raise_for_status()
+    if decode is not None and r.content:
+        with identity.decoding(s):
+            return decode(loads_json(r.content, getattr(decode, 'raw', False)))
+
+def _instrumented_request(s, resource, method, url, decode, started, kwargs):
+    api_url = s.settings()[0]
+    timings = {}
+    info = {
+        'resource': resource,
+        'method': method,
+        'url_template': utils.url_template(url[len(api_url):] if url.startswith(api_url) else url),
+        'status': None,
+        'bytes': 0,
+        'timings': timings,
+    }
+    t0 = timer()
+    if started is not None:
+        timings['prepare'] = t0 - started
+    for hook in s.on_request:
+        hook(info)
+    try:
+        r = s.request(method, url, **kwargs)
+        t1 = timer()
+        timings['network'] = t1 - t0
+        info['status'] = r.status_code
+        info['bytes'] = len(r.content)
+        r.raise_for_status()
+        if decode is None or not r.content:
+            return None
+        with identity.decoding(s):
+            values = loads_json(r.content, getattr(decode, 'raw', False))
+            t2 = timer()
+            timings['json'] = t2 - t1
+            result = decode(values)
+        timings['decode'] = timer() - t2
+        return result
+    except Exception, err:
+        info['error'] = err
+        raise
+    finally:
+        for hook in s.on_response:
+            hook(info)
+
+
+class hybridmethod(object):
+    """
+    Method receiving the instance when called on one, the class otherwise.
+    """
+
+    def __init__(self, func):
+        self.func = func
+
+    def __get__(self, instance, owner):
+        return partial(self.func, instance if instance is not None else owner)
+
+
+def restore_resource(cls, values, state, client_settings=None):
+    instance = cls.__new__(cls)
+    dict.update(instance, values)
+    if state:
+        instance.__dict__.update(state)
+    if client_settings is not None:
+        # Clients hold locks and connections, the page gets a client of the same settings
+        instance._client = get_default_client().derive(**client_settings)
+    return instance
 
 
 class APIResource(dict):
+    """
+    When `sense.lazy_decode` is set, nested objects and dates are stored as raw json
+    values and only converted (then cached) the first time they are read.
+
+    Every method of the resource returns converted values, but `dict(resource)` and
+    `**resource` read the dict storage directly, without calling them: the keys not
+    read yet hold their raw json values (dates as strings, nested objects as dicts).
+    Use `dict(resource.items())` for a converted copy.
+    """
+
+    # Keys still holding a raw json value (lazy decoding)
+    _raw = frozenset()
+    # Shared per uid by the identity map of the client (see `sense.identity`)
+    interned = False
+
     def __init__(self, uid=None, **params):
         super(APIResource, self).__init__(**params)
 
@@ -77,13 +290,111 @@ class APIResource(dict):
         else:
             return super(APIResource, self).__str__()
 
+    def __repr__(self):
+        self._decode_all()
+        return super(APIResource, self).__repr__()
 
     def __getattr__(self, k):
+        if k in self._raw:
+            self._decode(k)
         try:
-            return self[k]
+            return dict.__getitem__(self, k)
         except KeyError, err:
             raise AttributeError(*err.args)
 
+    def __getitem__(self, k):
+        if k in self._raw:
+            self._decode(k)
+        return dict.__getitem__(self, k)
+
+    def __setitem__(self, k, v):
+        if k in self._raw:
+            self._raw = self._raw - set([k])
+        super(APIResource, self).__setitem__(k, v)
+
+    def __delitem__(self, k):
+        if k in self._raw:
+            self._raw = self._raw - set([k])
+        super(APIResource, self).__delitem__(k)
+
+    def __eq__(self, other):
+        self._decode_all()
+        if isinstance(other, APIResource):
+            other._decode_all()
+        return super(APIResource, self).__eq__(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __reduce__(self):
+        # Pickled as a plain dict, restoring items one by one is several times slower
+        state = dict((k, v) for k, v in self.__dict__.iteritems() if k not in ACCESSORS and k != '_client')
+        client = self.__dict__.get('_client')
+        if client is None:
+            return restore_resource, (type(self), dict(self), state or None)
+        settings = dict((k, getattr(client, k)) for k in CLIENT_SETTINGS if getattr(client, k) is not None)
+        return restore_resource, (type(self), dict(self), state or None, settings)
+
+    def get(self, k, default=None):
+        if k in self._raw:
+            self._decode(k)
+        return super(APIResource, self).get(k, default)
+
+    def pop(self, k, *default):
+        if k in self._raw:
+            self._decode(k)
+        return super(APIResource, self).pop(k, *default)
+
+    def setdefault(self, k, default=None):
+        if k in self._raw:
+            self._decode(k)
+        return super(APIResource, self).setdefault(k, default)
+
+    def values(self, *args, **kwargs):
+        self._decode_all()
+        return super(APIResource, self).values(*args, **kwargs)
+
+    def items(self, *args, **kwargs):
+        self._decode_all()
+        return super(APIResource, self).items(*args, **kwargs)
+
+    def itervalues(self, *args, **kwargs):
+        self._decode_all()
+        return super(APIResource, self).itervalues(*args, **kwargs)
+
+    def iteritems(self, *args, **kwargs):
+        self._decode_all()
+        return super(APIResource, self).iteritems(*args, **kwargs)
+
+    def viewvalues(self, *args, **kwargs):
+        self._decode_all()
+        return super(APIResource, self).viewvalues(*args, **kwargs)
+
+    def viewitems(self, *args, **kwargs):
+        self._decode_all()
+        return super(APIResource, self).viewitems(*args, **kwargs)
+
+    def popitem(self, *args, **kwargs):
+        self._decode_all()
+        return super(APIResource, self).popitem(*args, **kwargs)
+
+    def copy(self, *args, **kwargs):
+        self._decode_all()
+        return super(APIResource, self).copy(*args, **kwargs)
+
+    def update(self, *args, **kwargs):
+        self._decode_all()
+        return super(APIResource, self).update(*args, **kwargs)
+
+    def _decode(self, k):
+        v = super(APIResource, self).__getitem__(k)
+        super(APIResource, self).__setitem__(k, convert_to_sense_object(k, v))
+        self._raw = self._raw - set([k])
+
+    def _decode_all(self):
+        for k in self._raw:
+            self._decode(k)
+
     @classmethod
     def _class_name(cls):
         if cls == APIResource:
@@ -108,27 +419,95 @@ class APIResource(dict):
 
     @classmethod
     def construct_from(cls, values):
+        if isinstance(values, APIResource):
+            return values
+        from . import compact_resources
+        if compact_resources and cls is not ListAPIResource:
+            converted = dict((k, convert_to_sense_object(k, v)) for k, v in values.iteritems())
+            record = records.construct_record(cls, converted)
+            if record is not None:
+                return record
+            instance = cls(values.get('id'))
+            instance.update(converted)
+            return instance
+
+        identity_map = identity.current()
+        uid = values.get('uid')
+        if identity_map is not None and cls.interned and uid:
+            instance, seen = identity_map.lookup(cls, uid)
+            if instance is not None:
+                if not seen:
+                    identity_map.seen(cls, uid)
+                    instance._refresh_from(values)
+                return instance
         instance = cls(values.get('id'))
+        if identity_map is not None and cls.interned and uid:
+            identity_map.add(cls, uid, instance)
         instance._refresh_from(values)
         return instance
 
     @classmethod
     def retrieve(cls, uid, **params):
-        instance = cls()
-        instance._refresh(uid, params)
-        return instance
+        return cls()._refresh(uid, params)
+
+    @classmethod
+    def retrieve_many(cls, uids, concurrency=None, **params):
+        """
+        Retrieve several objects concurrently over the pooled connections of the client.
+        Returns a `BulkResult` per uid, in order, holding the object or the error raised.
+
+        >>> import sense
+        >>> sense.api_key = '{{ api_key }}'
+        >>> results = sense.Node.retrieve_many(['{{ node.uid }}', '{{ other_node.uid }}'], concurrency=8)
+        >>> nodes = [r.value for r in results if r.ok]
+        """
+        s, _, __ = prepare_request(dict(params))
+        return s.map(lambda uid: cls.retrieve(uid, **params), uids, concurrency)
 
     def _refresh_from(self, values):
+        if isinstance(values, APIResource):
+            for k, v in dict.iteritems(values):
+                self[k] = v
+            if values._raw:
+                self._raw = self._raw | values._raw
+            return
+        from . import lazy_decode
+        if lazy_decode:
+            raw = set(self._raw)
+            for k, v in values.iteritems():
+                super(APIResource, self).__setitem__(k, v)
+                if needs_conversion(k, v):
+                    raw.add(k)
+                else:
+                    raw.discard(k)
+            self._raw = frozenset(raw)
+            return
         for k, v in values.iteritems():
-            super(APIResource, self).__setitem__(k, convert_to_sense_object(k, v))
+            self[k] = convert_to_sense_object(k, v)
 
     def _refresh(self, uid, params):
-        s, api_url, params = prepare_request(params)
-        url = api_url + self.instance_url(uid=uid)
-        r = s.get(url, params=utils.expand(params))
-        r.raise_for_status()
-        self._refresh_from(r.json())
-        return self
+        """
+        Returns this instance once refreshed, or the shared instance of its uid updated
+        in its place when the client has an identity map.
+        """
+        decode = select_fields(params, self._refresh_shared)
+        instance = api_request(type(self), 'GET', self.instance_url(uid=uid), params, decode)
+        return instance if instance is not None else self
+
+    def _refresh_shared(self, values):
+        self._refresh_from(values)
+        identity_map = identity.current()
+        uid = self.get('uid')
+        if identity_map is None or not self.interned or not uid:
+            return self
+        instance, seen = identity_map.lookup(type(self), uid)
+        if instance is None:
+            identity_map.add(type(self), uid, self)
+            return self
+        if not seen:
+            identity_map.seen(type(self), uid)
+            instance._refresh_from(self)
+        return instance
 
 
 class SingletonAPIResource(APIResource):
@@ -158,74 +537,141 @@ class ListAPIResource(APIResource):
     >>> # navigation with an iterator
     >>> for node in sense.Node.all():
     >>>     assert hasattr(node, 'uid')
+
+    `retrieve`, `list` and `all` accept a list of `fields` to request and decode, the
+    other keys are left out of the objects (`uid` and `object` are always kept).
+
+    >>> for node in sense.Node.all(fields=['label', 'updatedAt']):
+    >>>     print node.uid, node.label, node.updatedAt
     """
+    # Fields selected for the objects of this page (see `FieldsDecoder`)
+    _fields = None
+    # Client of the following pages, when not the default one
+    _client = None
 
     @classmethod
     def list(cls, **params):
-        s, api_url, params = prepare_request(params)
-        url = api_url + cls._class_url()
-        r = s.get(url, params=utils.expand(params))
-        r.raise_for_status()
-        return convert_to_sense_object(None, r.json())
+        return api_request(cls, 'GET', cls._class_url(), params, select_fields(params, convert_json))
 
     def next(self):
         if self.get('links') and self.links.get('next'):
-            s, _, __ = prepare_request()
-            r = s.get(self.links.next)
-            r.raise_for_status()
-            return self.construct_from(r.json())
+            return self._fetch_page(self.links.next)
         else:
             return
 
     def prev(self):
         if self.get('links') and self.links.get('prev'):
-            s, _, __ = prepare_request()
-            r = s.get(self.links.prev)
-            r.raise_for_status()
-            return self.construct_from(r.json())
+            return self._fetch_page(self.links.prev)
         else:
             return
 
+    def _fetch_page(self, url):
+        decode = self.construct_from
+        if self._fields is not None:
+            decode = FieldsDecoder(self._fields, decode)
+        return api_request(type(self), 'GET', url, {'client': self._client}, decode)
+
     @classmethod
-    def all(cls, **params):
+    def all(cls, prefetch=0, **params):
+        """
+        >>> import sense
+        >>> sense.api_key = '{{ api_key }}'
+        >>> for node in sense.Node.all(prefetch=3):
+        >>>     assert hasattr(node, 'uid')
+        """
         page = cls.list(**params)
-        return page.yield_all()
+        return page.yield_all(prefetch=prefetch)
+
+    def yield_all(self, prefetch=0):
+        """
+        Iterate over the objects of this page and of the following ones.
+
+        With `prefetch`, upcoming pages are fetched on the client executor while the
+        current one is consumed. When the page reports `totalObjects` and its next link
+        is numbered (`?page=2`), up to `prefetch` pages are requested in parallel,
+        otherwise read-ahead is limited to the next page. Pages are read one after the other
+        from the worker threads of the executor (e.g. in a `sense.aio` call).
+        """
+        # Chosen by the thread iterating
+        if not prefetch or on_executor():
+            objects = self._yield_sequential()
+        else:
+            urls = self._page_urls()
+            objects = self._yield_read_ahead() if urls is None else self._yield_parallel(urls, prefetch)
+        for o in objects:
+            yield o
+
+    def _yield_sequential(self):
+        page = self
+        while page is not None:
+            for o in page.objects:
+                yield o
+            page = page.next()
+
+    def _yield_read_ahead(self):
+        executor = (self._client or get_default_client()).executor
+        page = self
+        while page is not None:
+            pending = None
+            if page.get('links') and page.links.get('next'):
+                pending = executor.apply_async(page.next)
+            for o in page.objects:
+                yield o
+            page = pending.get() if pending is not None else None
 
-    def yield_all(self):
+    def _yield_parallel(self, urls, prefetch):
+        executor = (self._client or get_default_client()).executor
         for o in self.objects:
             yield o
-        if self.links.next:
-            page = self.next()
-            for o in page.yield_all():
+        pending = deque()
+        urls = iter(urls)
+        while True:
+            for url in urls:
+                pending.append(executor.apply_async(self._fetch_page, (url,)))
+                if len(pending) >= prefetch:
+                    break
+            if not pending:
+                return
+            for o in pending.popleft().get().objects:
                 yield o
 
+    def _page_urls(self):
+        """
+        Returns the urls of the following pages when they can be guessed from a numbered
+        next link and `totalObjects`, `None` otherwise.
+        """
+        next_url = self.get('links') and self.links.get('next')
+        per_page = len(self.get('objects') or [])
+        total = self.get('totalObjects')
+        number = next_url and utils.page_number(next_url)
+        if not number or not per_page or not isinstance(total, (int, long)):
+            return None
+        last = (total + per_page - 1) // per_page
+        return [utils.page_url(next_url, n) for n in range(number, last + 1)]
+
 
 class CreateUpdateAPIResource(APIResource):
 
     @classmethod
     def create(cls, **params):
-        s, api_url, params = prepare_request(params)
-        r = s.post(api_url + cls._class_url(), data=params)
-        r.raise_for_status()
-        return convert_to_sense_object(None, r.json())
+        return api_request(cls, 'POST', cls._class_url(), params, convert_json)
 
     def save(self, **params):
-        s, api_url, _ = prepare_request()
         data = self.serialize()
         data.update(params)
-        r = s.put(api_url + self.instance_url(), data=data)
-        r.raise_for_status()
-        if r.status_code == 200:
-            return convert_to_sense_object(None, r.json())
+        return api_request(type(self), 'PUT', self.instance_url(), data, convert_json)
 
 
 class DeleteAPIResource(APIResource):
 
-    def delete(self):
-        s, api_url, _ = prepare_request()
-        r = s.delete(api_url + self.instance_url())
-        r.raise_for_status()
-        return None
+    def delete(self, **params):
+        # The client holding the instance, derived from the settings like the request's
+        client = prepare_request(dict(params))[0]
+        result = api_request(type(self), 'DELETE', self.instance_url(), params)
+        identity_map = client.identity_map
+        if identity_map is not None and self.interned:
+            identity_map.invalidate(type(self), self.get('uid'))
+        return result
 
 
 class User(SingletonAPIResource):
@@ -241,18 +687,22 @@ class User(SingletonAPIResource):
         >>> import sense
         >>> api_key = sense.User.api_key(username='{{ user.username }}', password='__your_Sen.se_account_password__')
         """
-        from . import api_url
-        url = api_url + cls._class_url() + 'api_key/'
-        r = requests.post(url, data=kwargs)
-        r.raise_for_status()
-        return r.json().get('token')
+        return api_request(cls, 'POST', cls._class_url() + 'api_key/', kwargs,
+                           lambda token: token.get('token'), auth=None)
 
 
 class Node(ListAPIResource):
+    interned = True
 
     @property
     def feeds(self):
-        return type('Feed', (Feed,), {'node_obj':self})
+        """
+        The feeds of the node, see `NodeFeeds`.
+        """
+        feeds = self.__dict__.get('_feeds')
+        if feeds is None or feeds.node is not self:
+            feeds = self._feeds = NodeFeeds(self)
+        return feeds
 
     @classmethod
     def list(cls, **params):
@@ -281,19 +731,71 @@ class Node(ListAPIResource):
         }
 
 
+class NodeFeeds(object):
+    """
+    Feeds of a node, addressed by their type under `/nodes/<uid>/feeds/`. Returned
+    (and kept) by `Node.feeds`.
+
+    >>> import sense
+    >>> node = sense.Node('{{ node.uid }}')
+    >>> node.feeds.retrieve('motion')
+    >>> node.feeds(type='motion').events.list()
+    """
+
+    def __init__(self, node):
+        self.node = node
+
+    def __call__(self, *args, **kwargs):
+        return Feed(*args, node_obj=self.node, **kwargs)
+
+    def _class_url(self):
+        return self()._class_url()
+
+    def list(self, **params):
+        return api_request(Feed, 'GET', self._class_url(), params, select_fields(params, convert_json))
+
+    def all(self, prefetch=0, **params):
+        return self.list(**params).yield_all(prefetch=prefetch)
+
+    def retrieve(self, uid, **params):
+        feed = self()._refresh(uid, params)
+        if feed.node_obj is not self.node:
+            # The shared instance of an identity map is addressed through the node as well
+            feed.node_obj = self.node
+            feed['node_uid'] = self.node['uid']
+        return feed
+
+    def retrieve_many(self, uids, concurrency=None, **params):
+        s, _, __ = prepare_request(dict(params))
+        return s.map(lambda uid: self.retrieve(uid, **params), uids, concurrency)
+
+
 class Feed(ListAPIResource):
+    interned = True
     node_obj = None
 
     def __init__(self, *args, **kwargs):
+        node_obj = kwargs.pop('node_obj', None)
         super(Feed, self).__init__(*args, **kwargs)
-        if self.node_obj:
-            self['node_uid'] = self.node_obj['uid']
+        if node_obj is not None:
+            self.node_obj = node_obj
+            self['node_uid'] = node_obj['uid']
 
-    @classmethod
-    def _class_url(cls):
-        if not cls.node_obj:
-            return super(Feed, cls)._class_url()
-        return ''.join((cls.node_obj.instance_url(), cls._class_name(), 's/'))
+    @hybridmethod
+    def _class_url(self):
+        """
+        `/feeds/`, or the feeds of the node of the feed (`/nodes/<uid>/feeds/`) when
+        called on a feed of a node.
+        """
+        if isinstance(self, type):
+            return super(Feed, self)._class_url()
+        if self.node_obj is not None:
+            node = self.node_obj
+        elif self.get('node_uid'):
+            node = Node(self['node_uid'])
+        else:
+            return super(Feed, type(self))._class_url()
+        return ''.join((node.instance_url(), Feed._class_name(), 's/'))
 
     def instance_url(self, uid=None):
         if self.get('node_uid') and (self.get('type') or uid):
@@ -311,11 +813,13 @@ class Feed(ListAPIResource):
     @property
     def events(self):
         """
-        This allow all events class to be based on the /events/ endpoint.
-         Remove eventual nesting under the /nodes/(uid) endpoint.
+        The events of the feed, an `Event` bound to it and kept by the feed. Their url is
+        based on the feed uid (`/feeds/<uid>/events/`) or type for feeds of a node.
         """
-        feed = copy(self)
-        return type('Event', (Event,), {'feed_obj':feed})()
+        events = self.__dict__.get('_events')
+        if events is None or events.feed_obj is not self:
+            events = self._events = Event(feed_obj=self)
+        return events
 
     @classmethod
     def list(cls, **params):
@@ -341,6 +845,15 @@ class Feed(ListAPIResource):
 class Event(APIResource):
     feed_obj = None
 
+    def __init__(self, *args, **kwargs):
+        feed_obj = kwargs.pop('feed_obj', None)
+        super(Event, self).__init__(*args, **kwargs)
+        if feed_obj is not None:
+            self.feed_obj = feed_obj
+
+    def _events_path(self):
+        return ''.join((self.feed_obj.instance_url().rstrip('/'), Event._class_url()))
+
     def list(self, **params):
         """
         >>> import sense
@@ -348,11 +861,73 @@ class Event(APIResource):
         >>> feed = sense.Feed.retrieve('{{ feed.uid }}')
         >>> feed.events.list(limit=3)
         """
-        s, api_url, params = prepare_request(params)
-        url = ''.join((api_url, self.feed_obj.instance_url().rstrip('/'), Event._class_url()))
-        r = s.get(url, params=params)
-        r.raise_for_status()
-        return convert_to_sense_object(None, r.json())
+        return api_request(Event, 'GET', self._events_path(), params, select_fields(params, convert_json))
+
+    def iter(self, start=None, end=None, window=None, **params):
+        """
+        Iterate over the events of the feed between `start` and `end` (datetimes or
+        ISO-8601 strings), page by page so only one page is held in memory. With a
+        `window` (a timedelta) the range is listed one time window after the other.
+
+        >>> import sense
+        >>> import datetime
+        >>> sense.api_key = '{{ api_key }}'
+        >>> feed = sense.Feed('{{ feed.uid }}')
+        >>> end = datetime.datetime.utcnow()
+        >>> for event in feed.events.iter(start=end - datetime.timedelta(days=90), end=end, window=datetime.timedelta(days=1)):
+        >>>     print event.dateEvent
+        """
+        for window_params in self._windows(start, end, window, params):
+            for event in self.list(**window_params).yield_all():
+                yield event
+
+    @staticmethod
+    def _windows(start, end, window, params):
+        for window_start, window_end in utils.time_windows(start, end, window):
+            if window_start is not None:
+                params['start'] = utils.isoformat(window_start)
+            if window_end is not None:
+                params['end'] = utils.isoformat(window_end)
+            yield dict(params)
+
+    def _raw_pages(self, start=None, end=None, window=None, **params):
+        """
+        Iterate over the pages of events as lists of json objects.
+        """
+        client = params.get('client')
+        for window_params in self._windows(start, end, window, params):
+            page = api_request(Event, 'GET', self._events_path(), window_params, raw_json)
+            while page:
+                yield page.get('objects') or []
+                url = (page.get('links') or {}).get('next')
+                page = api_request(Event, 'GET', url, {'client': client}, raw_json) if url else None
+
+    def to_arrays(self, start=None, end=None, window=None, fields=None, **params):
+        """
+        Returns the events of the feed (see `iter`) as an ordered dict of numpy arrays, one per
+        column: `dateEvent`, `payload`, the flattened keys of `data` (`data.<key>`), etc.
+        Rows are never built as `Event` objects, see `sense.columnar`. `fields` limits the columns.
+
+        >>> import sense
+        >>> sense.api_key = '{{ api_key }}'
+        >>> feed = sense.Feed('{{ feed.uid }}')
+        >>> columns = feed.events.to_arrays(start='2014-01-01', end='2014-04-01', limit=1000)
+        >>> columns['dateEvent'], columns['payload']
+        """
+        import columnar
+        return columnar.to_arrays(self._raw_pages(start, end, window, **params), fields)
+
+    def to_dataframe(self, start=None, end=None, window=None, fields=None, **params):
+        """
+        Same as `to_arrays` as a pandas DataFrame.
+
+        >>> import sense
+        >>> sense.api_key = '{{ api_key }}'
+        >>> feed = sense.Feed('{{ feed.uid }}')
+        >>> df = feed.events.to_dataframe(start='2014-01-01', limit=1000).set_index('dateEvent')
+        """
+        import columnar
+        return columnar.to_dataframe(self._raw_pages(start, end, window, **params), fields)
 
     def create(self, **params):
         """
@@ -364,13 +939,27 @@ class Event(APIResource):
         >>> cur_date = datetime.datetime.utcnow()
         >>> feed.events.create(data=data, dateEvent=cur_date.isoformat())
         """
+        api_request(Event, 'POST', self._events_path(), params, json_body=True)
+
+    def create_many(self, events, **params):
+        """
+        Post several events to the feed concurrently over the pooled connections of the client.
+        Returns a `BulkResult` per event, in order, holding the error of failed posts.
+
+        >>> import sense
+        >>> sense.api_key = '{{ api_key }}'
+        >>> feed = sense.Feed('{{ feed.uid }}')
+        >>> results = feed.events.create_many([{'data': {'key': 'value'}}, {'data': {'key': 'other-value'}}])
+        >>> failed = [r.item for r in results if not r.ok]
+        """
         s, api_url, params = prepare_request(params)
-        url = ''.join((api_url, self.feed_obj.instance_url().rstrip('/'), Event._class_url()))
-        r = s.post(url, data=json.dumps(params), headers=dict(s.headers, **{'Content-Type': 'application/json'}))
-        r.raise_for_status()
+        url = api_url + self._events_path()
+        return s.map(lambda event: send_request(s, Event, 'POST', url, data=serializer.dumps(event),
+                                                headers=JSON_HEADERS), events)
 
 
 class Subscription(ListAPIResource, CreateUpdateAPIResource, DeleteAPIResource):
+    interned = True
 
     def serialize(self):
         return {
@@ -401,7 +990,7 @@ class Subscription(ListAPIResource, CreateUpdateAPIResource, DeleteAPIResource):
         """
         return super(Subscription, cls).create(**params)
 
-    def save(self):
+    def save(self, **params):
         """
         >>> import sense
         >>> sense.api_key = '{{ api_key }}'
@@ -409,16 +998,16 @@ class Subscription(ListAPIResource, CreateUpdateAPIResource, DeleteAPIResource):
         >>> subscription.gatewayUrl = 'https://example.com/another_endpoint/'
         >>> subscription.save()
         """
-        return super(Subscription, self).save()
+        return super(Subscription, self).save(**params)
 
-    def delete(self):
+    def delete(self, **params):
         """
         >>> import sense
         >>> sense.api_key = '{{ api_key }}'
         >>> subscription = sense.Subscription.retrieve('{{ subscription.uid }}')
         >>> subscription.delete()
         """
-        return super(Subscription, self).delete()
+        return super(Subscription, self).delete(**params)
 
 
 class Person(ListAPIResource):
@@ -431,3 +1020,7 @@ class Person(ListAPIResource):
 
 class Device(ListAPIResource): pass
 class Application(ListAPIResource): pass
+
+# Classes of the json objects, by their "object" key
+RESOURCE_TYPES = {'node': Node, 'feed': Feed, 'user': User,
+                  'subscription': Subscription, 'list': ListAPIResource}
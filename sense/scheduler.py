@@ -0,0 +1,152 @@
+"""
+Scheduling of the requests sent by a `sense.Client`.
+
+Every request goes through the scheduler of its client, which:
+
+    * spaces requests with a token bucket when a `rate` (requests per second) is set,
+    * caps the number of requests in flight, halving the cap when the server throttles
+      (429/503) and growing it back slowly on success,
+    * retries 429 and 5xx responses of idempotent verbs (and 429 of any verb, which the
+      server did not process) honoring `Retry-After`, else with exponential backoff and jitter.
+
+>>> import sense
+>>> sense.default_client = sense.Client(scheduler=sense.Scheduler(rate=20, burst=40, max_concurrency=8))
+>>> sense.default_client.scheduler.metrics()
+"""
+import time
+import random
+import threading
+import email.utils
+
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+THROTTLE_STATUSES = frozenset([429, 503])
+
+
+def retry_after(r):
+    """
+    Returns the delay in seconds asked by the `Retry-After` header of a response, or None.
+    """
+    value = r.headers.get('Retry-After')
+    if not value:
+        return None
+    if value.strip().isdigit():
+        return float(value)
+    date = email.utils.parsedate_tz(value)
+    if date is None:
+        return None
+    return max(0.0, email.utils.mktime_tz(date) - time.time())
+
+
+class TokenBucket(object):
+    """
+    Allows `rate` acquisitions per second on average and bursts of `capacity`.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.time()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Take a token, sleeping until one is available. Returns the time waited.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.time()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class Scheduler(object):
+
+    def __init__(self, rate=None, burst=None, max_concurrency=None, min_concurrency=1,
+                 max_retries=3, backoff=0.5, max_backoff=30.0):
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max_concurrency) if max_concurrency else None
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.queued = self.in_flight = self.throttled = self.retries = self.completed = 0
+        self._cond = threading.Condition()
+
+    def send(self, method, send):
+        """
+        Call `send()`, which sends a request and returns its response, within the
+        scheduler limits, retrying it when allowed.
+        """
+        attempt = 0
+        while True:
+            self._enter()
+            try:
+                if self.bucket is not None:
+                    self.bucket.acquire()
+                r = send()
+            finally:
+                self._leave()
+
+            if r.status_code not in RETRY_STATUSES:
+                self._succeeded()
+                return r
+            if r.status_code in THROTTLE_STATUSES:
+                self._throttled()
+            if attempt >= self.max_retries or not (method in IDEMPOTENT_METHODS or r.status_code == 429):
+                return r
+
+            delay = retry_after(r)
+            if delay is None:
+                delay = self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+            attempt += 1
+            with self._cond:
+                self.retries += 1
+            time.sleep(min(delay, self.max_backoff))
+
+    def _enter(self):
+        with self._cond:
+            self.queued += 1
+            while self.limit is not None and self.in_flight >= max(1, int(self.limit)):
+                self._cond.wait()
+            self.queued -= 1
+            self.in_flight += 1
+
+    def _leave(self):
+        with self._cond:
+            self.in_flight -= 1
+            self.completed += 1
+            self._cond.notify()
+
+    def _throttled(self):
+        with self._cond:
+            self.throttled += 1
+            if self.limit is None:
+                # Start limiting concurrency from the current load
+                self.limit = float(max(self.in_flight + 1, self.min_concurrency))
+            self.limit = max(float(self.min_concurrency), self.limit / 2)
+
+    def _succeeded(self):
+        if self.limit is None:
+            return
+        with self._cond:
+            limit = self.limit + 1 / self.limit
+            if self.max_concurrency:
+                limit = min(float(self.max_concurrency), limit)
+            self.limit = limit
+            self._cond.notify()
+
+    def metrics(self):
+        with self._cond:
+            return {'queued': self.queued, 'in_flight': self.in_flight, 'throttled': self.throttled,
+                    'retries': self.retries, 'completed': self.completed,
+                    'concurrency_limit': self.limit}
@@ -0,0 +1,67 @@
+"""
+JSON encoding and decoding of the request and response bodies.
+
+The backend is chosen by `sense.json_backend`: 'json' (standard library), 'ujson', any
+object providing `loads` and `dumps`, or None to decode with ujson when it is installed.
+
+With the standard library parser, resources are built while the response is parsed
+(an `object_hook` called on each json object) instead of walking the decoded values a
+second time. Converting the values costs more than parsing them, so by default response
+bodies are decoded this way and ujson parses the rest (raw values kept by
+`sense.lazy_decode` and `sense.compact_resources`), with precise floats and falling back
+on the standard library for integers beyond 64 bits, so that both decode the same values.
+Request bodies are encoded by the standard library unless a backend is chosen: ujson
+rounds floats to 10 decimals and encodes dates as timestamps instead of rejecting them.
+An explicit backend other than 'json' is used everywhere, its values being converted
+after parsing.
+
+>>> import sense
+>>> sense.json_backend = 'json'
+"""
+import json
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+def backend():
+    from . import json_backend
+    if json_backend is None:
+        return ujson or json
+    if json_backend == 'json':
+        return json
+    if json_backend == 'ujson':
+        if ujson is None:
+            raise ImportError('sense.json_backend is ujson but ujson is not installed')
+        return ujson
+    return json_backend
+
+
+def supports_object_hook():
+    from . import json_backend
+    return json_backend is None or backend() is json
+
+
+def dumps(values):
+    from . import json_backend
+    if json_backend is None:
+        return json.dumps(values)
+    return backend().dumps(values)
+
+
+def loads(content, object_hook=None):
+    """
+    Decode `content`. The `object_hook` is only honored when `supports_object_hook()`.
+    """
+    if object_hook is not None and supports_object_hook():
+        return json.loads(content, object_hook=object_hook)
+    from . import json_backend
+    if json_backend is None and ujson is not None:
+        try:
+            return ujson.loads(content, precise_float=True)
+        except ValueError:
+            # Integers too big for ujson (or invalid json, raised again)
+            return json.loads(content)
+    return backend().loads(content)
@@ -0,0 +1,110 @@
+"""
+Local mirror of the nodes of an account, kept up to date incrementally.
+
+`NodeMirror` stores the nodes by uid along with the highest `updatedAt` seen (the
+watermark). A pass only applies the nodes updated since the watermark:
+
+    * with `since_param`, the server filters them (e.g. `updatedAt__gte`),
+    * with `ordering`, the server sorts the nodes by descending `updatedAt` and the pass
+      stops at the first node older than the watermark,
+    * otherwise every page is read, which is also how removed nodes are detected.
+
+Removals are only known after a full pass, run every `full_every` passes (and on the
+first one) or with `sync(full=True)`.
+
+>>> import sense
+>>> from sense.sync import NodeMirror
+>>> mirror = NodeMirror(ordering=('ordering', '-updatedAt'), full_every=24)
+>>> result = mirror.sync()
+>>> result.added, result.changed, result.removed
+>>> mirror['{{ node.uid }}'].label
+"""
+from copy import deepcopy
+from collections import namedtuple
+import utils
+from resources import Node, prepare_request
+
+
+class SyncResult(namedtuple('SyncResult', ['added', 'changed', 'removed'])):
+    """
+    Sets of the uids added, changed and removed by a pass.
+    """
+    __slots__ = ()
+
+    def __nonzero__(self):
+        return bool(self.added or self.changed or self.removed)
+
+
+class NodeMirror(object):
+    resource_class = Node
+
+    def __init__(self, since_param=None, ordering=None, full_every=None, prefetch=0, **params):
+        """
+        `ordering` is the (parameter, value) pair sorting the list by descending `updatedAt`,
+        `params` are sent with every list request.
+        """
+        self.since_param = since_param
+        self.ordering = ordering
+        self.full_every = full_every
+        self.prefetch = prefetch
+        self.params = params
+        self.nodes = {}
+        # Copies of the nodes when last applied, kept when the client has an identity map
+        # (see `sense.identity`): the nodes and their feeds are then updated in place
+        self._snapshots = {}
+        self.watermark = None
+        self.passes = 0
+
+    def __getitem__(self, uid):
+        return self.nodes[uid]
+
+    def __contains__(self, uid):
+        return uid in self.nodes
+
+    def __iter__(self):
+        return self.nodes.itervalues()
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def sync(self, full=False):
+        """
+        Fetch and apply the changes since the last pass, returns a `SyncResult`.
+        """
+        full = (full or self.watermark is None or
+                bool(self.full_every and self.passes % self.full_every == 0) or
+                not (self.since_param or self.ordering))
+        params = dict(self.params)
+        if self.ordering:
+            params[self.ordering[0]] = self.ordering[1]
+        if not full and self.since_param:
+            params[self.since_param] = utils.isoformat(self.watermark)
+
+        mapped = prepare_request(dict(self.params))[0].identity_map is not None
+        added, changed, seen = set(), set(), set()
+        watermark = self.watermark
+        for node in self.resource_class.all(prefetch=self.prefetch, **params):
+            updated = node.get('updatedAt')
+            if not full and self.ordering and updated is not None and updated < self.watermark:
+                break
+            uid = node.uid
+            seen.add(uid)
+            if uid not in self.nodes:
+                added.add(uid)
+            elif node != (self._snapshots.get(uid) if mapped else self.nodes[uid]):
+                changed.add(uid)
+            self.nodes[uid] = node
+            if mapped:
+                self._snapshots[uid] = deepcopy(node)
+            if updated is not None and (watermark is None or updated > watermark):
+                watermark = updated
+
+        removed = set()
+        if full:
+            removed = set(self.nodes) - seen
+            for uid in removed:
+                del self.nodes[uid]
+                self._snapshots.pop(uid, None)
+        self.watermark = watermark
+        self.passes += 1
+        return SyncResult(added, changed, removed)
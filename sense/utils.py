@@ -1,6 +1,12 @@
 import sys
+import re
+import urllib
+import urlparse
+import datetime
+from dateutil import parser, tz
 from requests.auth import AuthBase
 import hmac, hashlib
+from collections import namedtuple
 
 def utf8(value):
     if isinstance(value, unicode) and sys.version_info < (3, 0):
@@ -13,11 +19,151 @@ def expand(d):
     for k, v in d.items():
         if k == 'expand':
             r['expand[]'] = v
+        elif k == 'fields' and not isinstance(v, basestring):
+            r['fields'] = ','.join(v)
         else:
             r[k] = v
     return r
 
 
+ISO_8601 = re.compile(
+    r'(\d{4})-(\d\d)-(\d\d)(?:[T ](\d\d):(\d\d)(?::(\d\d)(?:\.(\d{1,6}))?)?)?'
+    r'(?:(Z)|([+-])(\d\d):?(\d\d))?$')
+
+DATE_CACHE_SIZE = 4096
+_date_cache = {}
+
+def parse_datetime(value):
+    """
+    Parse the ISO-8601 dates returned by the API, falling back on `dateutil` for other formats.
+    Results are kept in a bounded cache since list pages often repeat the same timestamps.
+    """
+    try:
+        return _date_cache[value]
+    except (KeyError, TypeError):
+        pass
+
+    m = ISO_8601.match(value) if isinstance(value, basestring) else None
+    if m is None:
+        return parser.parse(value)
+
+    year, month, day, hour, minute, second, fraction, utc, sign, tz_hour, tz_minute = m.groups()
+    if utc:
+        tzinfo = tz.tzutc()
+    elif sign:
+        offset = int(tz_hour) * 3600 + int(tz_minute) * 60
+        tzinfo = tz.tzoffset(None, -offset if sign == '-' else offset) if offset else tz.tzutc()
+    else:
+        tzinfo = None
+    d = datetime.datetime(int(year), int(month), int(day), int(hour or 0), int(minute or 0),
+                          int(second or 0), int(fraction.ljust(6, '0')) if fraction else 0, tzinfo)
+
+    if len(_date_cache) >= DATE_CACHE_SIZE:
+        _date_cache.clear()
+    _date_cache[value] = d
+    return d
+
+
+def isoformat(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return value
+
+
+def time_windows(start, end, window=None):
+    """
+    Split [start, end) in consecutive (start, end) windows of `window` length.
+    """
+    if window is None:
+        return [(start, end)]
+    if start is None or end is None:
+        raise ValueError('Both start and end are needed to split a range in windows')
+    if isinstance(start, basestring):
+        start = parse_datetime(start)
+    if isinstance(end, basestring):
+        end = parse_datetime(end)
+    windows = []
+    while start < end:
+        windows.append((start, min(start + window, end)))
+        start += window
+    return windows
+
+
+def url_template(path):
+    """
+    Replace the identifiers of a path by placeholders: `/nodes/{uid}/feeds/{uid}/`.
+    """
+    segments = [s for s in urlparse.urlsplit(path).path.split('/') if s]
+    return '/%s/' % '/'.join('{uid}' if i % 2 else s for i, s in enumerate(segments)) if segments else '/'
+
+
+def page_number(url):
+    """
+    Returns the `page` query parameter of a list url as an int, or None.
+    """
+    for k, v in urlparse.parse_qsl(urlparse.urlsplit(url).query):
+        if k == 'page':
+            return int(v) if v.isdigit() else None
+
+
+def page_url(url, number):
+    """
+    Returns `url` with its `page` query parameter set to `number`.
+    """
+    parts = urlparse.urlsplit(url)
+    query = [(k, number if k == 'page' else v)
+             for k, v in urlparse.parse_qsl(parts.query, keep_blank_values=True)]
+    return urlparse.urlunsplit(parts._replace(query=urllib.urlencode(query)))
+
+
+class BulkResult(namedtuple('BulkResult', ['item', 'value', 'error'])):
+    """
+    Outcome of one item of a bulk operation: `value` on success, the raised `error` otherwise.
+    """
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+TOKEN_CACHE_SIZE = 1024
+_tokens = {}
+_auths = {}
+
+def token(api_key, app_secret=None):
+    """
+    Returns the token identifying `api_key`: its HMAC-SHA512 by `app_secret` when given.
+    The HMAC is computed once per (api_key, app_secret) pair.
+    """
+    if not app_secret:
+        return api_key
+    try:
+        return _tokens[(api_key, app_secret)]
+    except KeyError:
+        pass
+    t = hmac.new(app_secret, msg=api_key, digestmod=hashlib.sha512).hexdigest()
+    if len(_tokens) >= TOKEN_CACHE_SIZE:
+        _tokens.clear()
+    _tokens[(api_key, app_secret)] = t
+    return t
+
+
+def token_auth(api_key, app_secret=None):
+    """
+    Returns a `SenseTokenAuth` shared by every session and thread using the same credentials.
+    """
+    try:
+        return _auths[(api_key, app_secret)]
+    except KeyError:
+        pass
+    auth = SenseTokenAuth(api_key, app_secret)
+    if len(_auths) >= TOKEN_CACHE_SIZE:
+        _auths.clear()
+    _auths[(api_key, app_secret)] = auth
+    return auth
+
+
 class SenseTokenAuth(AuthBase):
     """
     Attaches Sen.se token auth header to the given Request object.
@@ -27,12 +173,8 @@ class SenseTokenAuth(AuthBase):
     def __init__(self, api_key, app_secret=None):
         self.api_key = api_key
         self.app_secret = app_secret
+        self.header = " Token %s" % token(api_key, app_secret)
 
     def __call__(self, r):
-        if self.app_secret:
-            token = hmac.new(self.app_secret, msg=self.api_key, digestmod=hashlib.sha512).hexdigest()
-        else:
-            token = self.api_key
-
-        r.headers['Authorization'] = " Token %s" % token
-        return r
\ No newline at end of file
+        r.headers['Authorization'] = self.header
+        return r
@@ -1,14 +1,19 @@
 __author__ = 'pierre'
 
 import unittest
-from copy import deepcopy
+from copy import copy, deepcopy
 import datetime
+import time
 import json
+import threading
+import BaseHTTPServer
+import SocketServer
 from getpass import getpass
 import requests
 import httpretty
 import sense
 from sense.resources import APIResource, ListAPIResource
+from sense import columnar
 
 DEFAULT_USER = 'demoone' 
 API_URL = 'https://sen.se/api/v2'
@@ -116,6 +121,32 @@ DUMMY_FEED = {
 }
 
 
+class StubServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+    Local HTTP server answering GET requests with the json registered in `routes` for their path.
+    """
+    daemon_threads = True
+
+    class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = self.server.routes.get(self.path)
+            self.send_response(200 if body is not None else 404)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps(body))
+
+        def log_message(self, *args):
+            pass
+
+    def __init__(self, routes):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0), self.Handler)
+        self.routes = routes
+        self.url = 'http://127.0.0.1:%s' % self.server_port
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+
 class TestUtils(unittest.TestCase):
 
     def test_process_params(self):
@@ -127,6 +158,32 @@ class TestUtils(unittest.TestCase):
         self.assertTrue(d.has_key('expand[]'))
         self.assertEqual(d['limit'], 12)
 
+    def test_parse_datetime(self):
+        from dateutil import parser, tz
+        from sense.utils import parse_datetime
+        for d in ['2014-04-16T12:39:11.542637', '2014-04-01T09:29:58', '2014-04-01T09:29:58.5-01:30',
+                  '2014-04-01T09:29:58+0200', '2014-04-01', 'April 1st 2014']:
+            self.assertEqual(parse_datetime(d), parser.parse(d))
+        self.assertEqual(parse_datetime('2014-04-01T09:29:58Z').tzinfo, tz.tzutc())
+        self.assertIs(parse_datetime('2014-04-01T09:29:58'), parse_datetime('2014-04-01T09:29:58'))
+
+    def test_token(self):
+        import hmac, hashlib
+        from sense.utils import token, token_auth, _tokens
+        self.assertEqual(token('key'), 'key')
+        self.assertEqual(token('key', 'secret'),
+                         hmac.new('secret', msg='key', digestmod=hashlib.sha512).hexdigest())
+        self.assertIn(('key', 'secret'), _tokens)
+        self.assertIs(token_auth('key', 'secret'), token_auth('key', 'secret'))
+        self.assertEqual(token_auth('key', 'secret').header, ' Token %s' % token('key', 'secret'))
+
+    def test_page_url(self):
+        from sense.utils import page_number, page_url
+        self.assertEqual(page_number(sense.api_url + '/nodes/?page=2'), 2)
+        self.assertIsNone(page_number(sense.api_url + '/nodes/?cursor=abc'))
+        self.assertEqual(page_url(sense.api_url + '/nodes/?limit=5&page=2', 7),
+                         sense.api_url + '/nodes/?limit=5&page=7')
+
 
 class TestAPIResource(unittest.TestCase):
 
@@ -162,6 +219,138 @@ class TestAPIResource(unittest.TestCase):
         self.assertEqual("%s" % u, d.get('uid'))
 
 
+class TestLazyDecode(unittest.TestCase):
+
+    def setUp(self):
+        sense.lazy_decode = True
+
+    def tearDown(self):
+        sense.lazy_decode = False
+
+    def test_lazy(self):
+        node = sense.Node.construct_from(DUMMY_NODE)
+        self.assertEqual(node._raw, set(['createdAt', 'updatedAt', 'subscribes', 'publishes']))
+        self.assertEqual(node.uid, 'testuid')
+
+        self.assertIsInstance(node.subscribes[0], sense.Feed)
+        self.assertIs(node['subscribes'], node.subscribes)
+        self.assertIsInstance(node.get('updatedAt'), datetime.datetime)
+        self.assertEqual(node._raw, set(['createdAt', 'publishes']))
+
+        node['createdAt'] = None
+        self.assertIsNone(node.createdAt)
+
+    def test_same_as_eager(self):
+        lazy = [sense.Node.construct_from(DUMMY_NODE) for _ in range(3)]
+        sense.lazy_decode = False
+        eager = sense.Node.construct_from(DUMMY_NODE)
+
+        self.assertEqual(lazy[0], eager)
+        self.assertEqual(dict(lazy[1].items()), eager)
+        self.assertEqual(repr(lazy[2]), repr(eager))
+
+    def test_dict(self):
+        node = sense.Node.construct_from(DUMMY_NODE)
+        # The dict storage holds the raw values of the keys not read yet
+        self.assertIsInstance(dict(node)['updatedAt'], basestring)
+        self.assertIs(type(dict(node)['subscribes'][0]), dict)
+
+        converted = dict(node.items())
+        self.assertIsInstance(converted['updatedAt'], datetime.datetime)
+        self.assertIsInstance(converted['subscribes'][0], sense.Feed)
+        # Converted values are written back
+        self.assertIsInstance(dict(node)['updatedAt'], datetime.datetime)
+        self.assertIsInstance(dict(node)['subscribes'][0], sense.Feed)
+
+
+class TestCompactResources(unittest.TestCase):
+
+    def setUp(self):
+        sense.compact_resources = True
+
+    def tearDown(self):
+        sense.compact_resources = False
+
+    def test_records(self):
+        from collections import Mapping
+        from sense.records import Record
+        page = sense.resources.convert_to_sense_object(None, DUMMY_NODES_PAGE)
+        self.assertIsInstance(page, ListAPIResource)
+
+        node = page.objects[0]
+        self.assertIsInstance(node, Record)
+        self.assertIsInstance(node, Mapping)
+        self.assertFalse(hasattr(node, '__dict__'))
+        self.assertIs(type(node), type(page.objects[1]))
+        self.assertEqual(node.uid, node['uid'])
+        self.assertIsInstance(node.updatedAt, datetime.datetime)
+        self.assertIs(node.subscribes[0].resource_class, sense.Feed)
+        self.assertRaises(AttributeError, lambda: node.blah)
+        self.assertRaises(KeyError, lambda: node['blah'])
+        self.assertRaises(TypeError, setattr, node, 'label', 'new label')
+        self.assertEqual("%s" % node, 'testuid')
+
+        resource = node.to_resource()
+        self.assertIsInstance(resource, sense.Node)
+        self.assertEqual(list(resource.serialize()['publishes']), ['AiX2oDNRjswKT9yxMAXNAgxcGBqeHX7P'])
+        sense.compact_resources = False
+        self.assertEqual(node, sense.Node.construct_from(DUMMY_NODE))
+
+    def test_fallback(self):
+        resource = APIResource.construct_from({'expand[]': 'devices'})
+        self.assertIsInstance(resource, APIResource)
+
+
+class TestSerializer(unittest.TestCase):
+
+    def tearDown(self):
+        sense.json_backend = None
+
+    def test_single_pass(self):
+        sense.json_backend = 'json'
+        content = json.dumps(DUMMY_NODES_PAGE)
+        page = sense.resources.loads_json(content)
+        self.assertIsInstance(page, ListAPIResource)
+        self.assertIsInstance(page.objects[0], sense.Node)
+        self.assertIsInstance(page.objects[0].subscribes[0], sense.Feed)
+        self.assertIsInstance(page.objects[0].updatedAt, datetime.datetime)
+        self.assertEqual(page, sense.resources.convert_json(json.loads(content)))
+        self.assertIs(sense.resources.convert_json(page), page)
+
+        node = sense.Node()
+        node._refresh_from(sense.resources.loads_json(json.dumps(DUMMY_NODE)))
+        self.assertEqual(node, sense.Node.construct_from(DUMMY_NODE))
+
+    def test_backend(self):
+        class Backend(object):
+            loads = staticmethod(json.loads)
+            dumps = staticmethod(lambda values: json.dumps(values, sort_keys=True))
+
+        sense.json_backend = Backend
+        self.assertEqual(sense.serializer.dumps({'b': 1, 'a': 2}), '{"a": 2, "b": 1}')
+        # Without object hooks, values are converted after parsing
+        self.assertEqual(sense.resources.loads_json(json.dumps(DUMMY_NODE)), DUMMY_NODE)
+
+        sense.json_backend = 'json'
+        sense.lazy_decode = True
+        try:
+            self.assertEqual(sense.resources.loads_json(json.dumps(DUMMY_NODE)), DUMMY_NODE)
+        finally:
+            sense.lazy_decode = False
+
+    def test_default_loads(self):
+        # Raw values are decoded as by the standard library
+        content = json.dumps({'value': 1.0000000000000002, 'small': 0.1, 'big': 2 ** 64, 'negative': -2 ** 70})
+        self.assertEqual(sense.serializer.loads(content), json.loads(content))
+        self.assertRaises(ValueError, sense.serializer.loads, '{"value": ')
+        sense.lazy_decode = True
+        try:
+            event = sense.resources.loads_json(json.dumps(dict(DUMMY_EVENT, data={'value': 1.0000000000000002})))
+            self.assertEqual(event['data']['value'], 1.0000000000000002)
+        finally:
+            sense.lazy_decode = False
+
+
 class TestFeed(unittest.TestCase):
     def test_instance_url(self):
         feed = sense.Node('node-uid').feeds('feed-uid')
@@ -178,6 +367,34 @@ class TestFeed(unittest.TestCase):
 
         self.assertEqual(sense.Node('node-uid').feeds._class_url(), '/nodes/node-uid/feeds/')
 
+    def test_accessors(self):
+        node = sense.Node('node-uid')
+        self.assertIs(node.feeds, node.feeds)
+        feed = node.feeds(type='motion')
+        self.assertIs(type(feed), sense.Feed)
+        self.assertIs(feed.node_obj, node)
+        self.assertIsNone(sense.Feed.node_obj)
+
+        events = feed.events
+        self.assertIs(events, feed.events)
+        self.assertIs(type(events), sense.Event)
+        self.assertEqual(events._events_path(), '/nodes/node-uid/feeds/motion/events/')
+        self.assertEqual(sense.Feed('feed-uid').events._events_path(), '/feeds/feed-uid/events/')
+
+        self.assertEqual(feed._class_url(), '/nodes/node-uid/feeds/')
+        self.assertEqual(sense.Feed._class_url(), '/feeds/')
+        self.assertEqual(sense.Feed('feed-uid')._class_url(), '/feeds/')
+        # Copies get accessors of their own
+        original = sense.Feed('feed-uid')
+        original.events
+        other = copy(original)
+        other['uid'] = 'other-uid'
+        self.assertEqual(other.events._events_path(), '/feeds/other-uid/events/')
+        other = deepcopy(node)
+        other['uid'] = 'other-uid'
+        self.assertEqual(other.feeds._class_url(), '/nodes/other-uid/feeds/')
+        self.assertEqual(other.feeds(type='motion').instance_url(), '/nodes/other-uid/feeds/motion/')
+
 
 class TestSubscription(unittest.TestCase):
 
@@ -191,6 +408,191 @@ class TestSubscription(unittest.TestCase):
             self.assertIsInstance(e, basestring)
 
 
+class TestClient(unittest.TestCase):
+
+    def test_settings(self):
+        client = sense.Client(api_key='key')
+        self.assertEqual(client.settings(), (sense.api_url, 'key', None, sense.user_agent))
+
+        derived = client.derive(api_url='http://custom_url.com')
+        self.assertEqual(derived.settings()[:2], ('http://custom_url.com', 'key'))
+        self.assertIs(derived.session, client.session)
+
+    def test_pool(self):
+        client = sense.Client(pool_maxsize=20, max_retries=3)
+        adapter = client.session.get_adapter(sense.api_url)
+        self.assertEqual(adapter.max_retries, 3)
+        self.assertIs(client.session, client.session)
+
+
+class TestAio(unittest.TestCase):
+
+    def setUp(self):
+        self.api_url = sense.api_url
+        self.server = StubServer({})
+        sense.api_url = self.server.url
+        page1 = deepcopy(DUMMY_NODES_PAGE)
+        page1['links']['next'] = self.server.url + '/nodes/?page=2'
+        page2 = deepcopy(DUMMY_NODES_PAGE)
+        page2['links']['next'] = None
+        self.server.routes.update({
+            '/nodes/testuid/': DUMMY_NODE,
+            '/nodes/': page1,
+            '/nodes/?page=2': page2,
+            '/user/': DUMMY_USER,
+            '/feeds/testuid/events/': DUMMY_EVENTS_PAGE,
+        })
+
+    def tearDown(self):
+        sense.api_url = self.api_url
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_retrieve(self):
+        import sense.aio
+        pending = [sense.aio.Node.retrieve('testuid') for _ in range(5)]
+        user = sense.aio.User.retrieve()
+        for p in pending:
+            self.assertIsInstance(p.get(5), sense.Node)
+        self.assertIsInstance(user.get(5).devices[0], sense.Node)
+        self.assertRaises(requests.HTTPError, sense.aio.Feed.retrieve('missing').get, 5)
+
+    def test_all(self):
+        import sense.aio
+        nodes = list(sense.aio.Node.all())
+        self.assertEqual(len(nodes), 10)
+        self.assertIsInstance(nodes[-1], sense.Node)
+        self.assertEqual(len(list(sense.aio.Node.all(prefetch=0))), 10)
+
+        for n in range(50):
+            page = deepcopy(PAGE)
+            page['objects'] = [DUMMY_FEED]
+            page['links']['next'] = self.server.url + '/feeds/?cursor=%s' % (n + 1) if n < 49 else None
+            self.server.routes['/feeds/?cursor=%s' % n if n else '/feeds/'] = page
+        self.assertEqual(len(list(sense.aio.Feed.all(prefetch=2))), 50)
+        events = sense.aio.Event.list('testuid').get(5)
+        self.assertEqual(len(events.objects), 5)
+
+    def test_nested(self):
+        import sense.aio
+        sense.default_client = sense.Client(pool_maxsize=1)
+        try:
+            # Prefetching from the only worker thread reads the pages in turn
+            nodes = sense.aio.submit(list, sense.Node.all(prefetch=2)).get(5)
+            self.assertEqual(len(nodes), 10)
+        finally:
+            sense.default_client.close()
+            sense.default_client = None
+
+        sense.default_client = sense.Client(pool_maxsize=2)
+        try:
+            # Bulk calls from every worker thread
+            pending = [sense.aio.submit(sense.Node.retrieve_many, ['testuid'] * 3) for _ in range(2)]
+            for p in pending:
+                self.assertTrue(all(r.ok for r in p.get(5)))
+        finally:
+            sense.default_client.close()
+            sense.default_client = None
+
+
+
+class TestGateway(unittest.TestCase):
+
+    def setUp(self):
+        from sense.gateway import GatewayServer
+        self.server = GatewayServer(('127.0.0.1', 0), api_key='key', app_secret='secret', queue_size=2).start()
+        self.url = 'http://127.0.0.1:%s/' % self.server.server_port
+        self.session = requests.Session()
+        self.session.auth = sense.utils.token_auth('key', 'secret')
+
+    def tearDown(self):
+        self.session.close()
+        self.server.stop()
+
+    def test_receive(self):
+        r = self.session.post(self.url, data=json.dumps([DUMMY_EVENT, DUMMY_EVENT]))
+        self.assertEqual(r.status_code, 204)
+        event = self.server.get(timeout=1)
+        self.assertIsInstance(event, sense.Event)
+        self.assertEqual(event.data, DUMMY_EVENT['data'])
+        self.assertEqual(self.server.stats()['queued'], 1)
+
+        # Only room for one more event
+        r = self.session.post(self.url, data=json.dumps([DUMMY_EVENT, DUMMY_EVENT]))
+        self.assertEqual(r.status_code, 503)
+        self.assertEqual(r.headers['Retry-After'], '1')
+        self.assertEqual(self.session.post(self.url, data=json.dumps(DUMMY_EVENT)).status_code, 204)
+
+    def test_rejected(self):
+        self.assertEqual(requests.post(self.url, data=json.dumps(DUMMY_EVENT)).status_code, 401)
+        self.assertEqual(requests.post(self.url, data=json.dumps(DUMMY_EVENT),
+                                       auth=sense.utils.token_auth('key', 'other')).status_code, 401)
+        self.assertEqual(self.session.post(self.url, data='{"data":').status_code, 400)
+        self.assertEqual(self.server.stats(), {'received': 0, 'rejected': 0, 'unauthorized': 2,
+                                               'invalid': 1, 'queued': 0})
+
+    def test_no_length(self):
+        import socket
+        sock = socket.create_connection(('127.0.0.1', self.server.server_port), timeout=2)
+        try:
+            # The body of a request without Content-Length looks like another request
+            sock.sendall('POST / HTTP/1.1\r\nHost: gateway\r\n\r\n'
+                         'POST / HTTP/1.1\r\nHost: gateway\r\nContent-Length: 2\r\n\r\n{}')
+            received = ''
+            while True:
+                data = sock.recv(4096)
+                if not data:
+                    break
+                received += data
+        finally:
+            sock.close()
+        self.assertTrue(received.startswith('HTTP/1.1 411'))
+        self.assertEqual(received.count('HTTP/1.1'), 1)
+        self.assertIn('Connection: close', received)
+
+    def test_callback(self):
+        from sense.gateway import GatewayServer
+        events = []
+        server = GatewayServer(('127.0.0.1', 0), verify=False, callback=events.append).start()
+        try:
+            r = requests.post('http://127.0.0.1:%s/' % server.server_port, data=json.dumps(DUMMY_EVENT))
+        finally:
+            server.stop()
+        self.assertEqual(r.status_code, 204)
+        self.assertEqual(events[0].nodeUid, DUMMY_EVENT['nodeUid'])
+
+
+class TestScheduler(unittest.TestCase):
+
+    class Response(object):
+        def __init__(self, status_code, **headers):
+            self.status_code = status_code
+            self.headers = requests.structures.CaseInsensitiveDict(headers)
+
+    def test_retries(self):
+        from sense.scheduler import Scheduler, retry_after
+        responses = [self.Response(429, **{'Retry-After': '0'}), self.Response(503), self.Response(200)]
+        scheduler = Scheduler(max_concurrency=8, backoff=0)
+
+        r = scheduler.send('GET', lambda: responses.pop(0))
+        self.assertEqual(r.status_code, 200)
+        metrics = scheduler.metrics()
+        self.assertEqual((metrics['retries'], metrics['throttled'], metrics['in_flight']), (2, 2, 0))
+        self.assertLess(metrics['concurrency_limit'], 8)
+
+        self.assertEqual(scheduler.send('POST', lambda: self.Response(500)).status_code, 500)
+        self.assertEqual(scheduler.metrics()['retries'], 2)
+        self.assertEqual(retry_after(self.Response(429, **{'Retry-After': '12'})), 12)
+
+    def test_rate(self):
+        from sense.scheduler import TokenBucket
+        bucket = TokenBucket(rate=100, capacity=1)
+        start = time.time()
+        for _ in range(6):
+            bucket.acquire()
+        self.assertGreaterEqual(time.time() - start, 0.045)
+
+
 class TestIntegration(unittest.TestCase):
 
     def setUp(self):
@@ -257,6 +659,13 @@ class TestIntegration(unittest.TestCase):
             self.assertTrue(hasattr(node, 'uid'))
         self.assertEqual(i,9)
 
+    def test_Node_all_prefetch(self):
+        nodes = list(sense.Node.all(prefetch=3))
+        self.assertEqual(len(nodes), 10)
+
+        page = ListAPIResource.construct_from(dict(DUMMY_NODES_PAGE, totalObjects=23))
+        self.assertEqual(page._page_urls(), [sense.api_url + '/nodes/?page=%s' % n for n in range(2, 6)])
+
     """
     def test_Node_create(self):
         httpretty.register_uri(
@@ -305,6 +714,17 @@ class TestIntegration(unittest.TestCase):
         self.assertEqual(result.uid, node.uid)
     """
 
+    def test_Node_retrieve_many(self):
+        httpretty.register_uri(httpretty.GET, sense.api_url + '/nodes/missing/', status=404)
+        results = sense.Node.retrieve_many(['testuid', 'missing', 'testuid'], concurrency=2,
+                                           expand=['feeds'])
+
+        self.assertEqual([r.item for r in results], ['testuid', 'missing', 'testuid'])
+        self.assertEqual([r.ok for r in results], [True, False, True])
+        self.assertIsInstance(results[0].value, sense.Node)
+        self.assertIsInstance(results[1].error, requests.HTTPError)
+        self.assertEqual(httpretty.last_request().querystring['expand[]'], ['feeds'])
+
     def test_Node_serialize(self):
         node = sense.Node.retrieve('testuid')
 
@@ -360,6 +780,25 @@ class TestIntegration(unittest.TestCase):
         self.assertIsInstance(s, sense.Subscription)
         self.assertIsNone(s.delete())
 
+    def test_Subscription_save_retried(self):
+        httpretty.register_uri(
+            httpretty.GET, sense.api_url + '/subscriptions/testuid/',
+            body=json.dumps(DUMMY_SUBSCRIPTION),
+            content_type='application/json')
+        bodies = []
+        def save(request, uri, headers):
+            bodies.append(request.parsed_body)
+            if len(bodies) == 1:
+                headers['Retry-After'] = '0'
+                return 503, headers, ''
+            return 200, headers, json.dumps(DUMMY_SUBSCRIPTION)
+        httpretty.register_uri(httpretty.PUT, sense.api_url + '/subscriptions/testuid/', body=save)
+
+        sense.Subscription.retrieve('testuid').save()
+        self.assertEqual(len(bodies), 2)
+        self.assertEqual(bodies[1], bodies[0])
+        self.assertEqual(bodies[1]['subscribes'], ['eJXayFlDihokjC00D8NFXXeIQnjF4R5x'])
+
     def test_Event_list(self):
         httpretty.register_uri(
             httpretty.GET, sense.api_url + '/feeds/testuid/',
@@ -398,6 +837,228 @@ class TestIntegration(unittest.TestCase):
         self.assertEqual(last_request.headers.get('Authorization'), 'Token apikey')
         self.assertEqual(last_request.headers.get('User-Agent'), sense.user_agent)
 
+    def test_Event_iter(self):
+        from StringIO import StringIO
+        from sense.export import write_ndjson, write_csv
+        page1 = deepcopy(DUMMY_EVENTS_PAGE)
+        page1['links']['next'] = sense.api_url + '/feeds/testuid/events/?page=2'
+        httpretty.register_uri(
+            httpretty.GET, sense.api_url + '/feeds/testuid/events/',
+            responses=[
+                httpretty.Response(body=json.dumps(page1)),
+                httpretty.Response(body=json.dumps(DUMMY_EVENTS_PAGE)),
+            ])
+
+        events = sense.Feed('testuid').events
+        out = StringIO()
+        self.assertEqual(write_ndjson(events.iter(start='2014-04-01', limit=5), out), 10)
+        self.assertEqual(json.loads(out.getvalue().splitlines()[-1]), DUMMY_EVENT)
+        self.assertEqual(httpretty.last_request().querystring['page'], ['2'])
+
+        httpretty.register_uri(
+            httpretty.GET, sense.api_url + '/feeds/otheruid/events/',
+            body=json.dumps(DUMMY_EVENTS_PAGE))
+        events = sense.Feed('otheruid').events
+        out = StringIO()
+        start = datetime.datetime(2014, 4, 1)
+        self.assertEqual(write_csv(events.iter(start=start, end=start + datetime.timedelta(days=3),
+                                               window=datetime.timedelta(days=2)), out), 10)
+        self.assertEqual(httpretty.last_request().querystring['start'], ['2014-04-03T00:00:00'])
+        self.assertEqual(httpretty.last_request().querystring['end'], ['2014-04-04T00:00:00'])
+        rows = out.getvalue().splitlines()
+        self.assertEqual(len(rows), 11)
+        self.assertIn('data.message', rows[0])
+
+    @unittest.skipIf(columnar.numpy is None, 'numpy is not installed')
+    def test_Event_to_arrays(self):
+        import numpy
+        page1 = deepcopy(DUMMY_EVENTS_PAGE)
+        page1['links']['next'] = sense.api_url + '/feeds/colsuid/events/?page=2'
+        page1['objects'] = [dict(DUMMY_EVENT, payload=i, data={'value': i}) for i in range(3)]
+        page2 = deepcopy(DUMMY_EVENTS_PAGE)
+        page2['objects'] = [dict(DUMMY_EVENT, payload=None, data={'value': 3.5, 'unit': 'C'})]
+        httpretty.register_uri(
+            httpretty.GET, sense.api_url + '/feeds/colsuid/events/',
+            responses=[httpretty.Response(body=json.dumps(page1)), httpretty.Response(body=json.dumps(page2))])
+
+        columns = sense.Feed('colsuid').events.to_arrays(limit=3)
+        self.assertEqual(columns.keys()[0], 'dateEvent')
+        self.assertEqual(columns['dateEvent'].dtype, numpy.dtype('datetime64[us]'))
+        self.assertEqual(columns['dateEvent'][0].astype(datetime.datetime), datetime.datetime(2014, 4, 16, 12, 39, 11, 542637))
+        self.assertTrue(numpy.isnat(columns['dateServer']).all())
+        self.assertEqual(columns['data.value'].tolist(), [0, 1, 2, 3.5])
+        self.assertEqual(columns['payload'].dtype, numpy.dtype('float64'))
+        self.assertTrue(numpy.isnan(columns['payload'][3]))
+        self.assertEqual(columns['data.unit'].tolist(), [None, None, None, 'C'])
+        self.assertEqual(len(columns['nodeUid']), 4)
+
+        from sense.columnar import to_arrays
+        self.assertEqual(to_arrays([[DUMMY_EVENT]], fields=['dateEvent', 'data.message']).keys(),
+                         ['dateEvent', 'data.message'])
+        # Values of a key holding objects in other rows are kept in its own column
+        columns = to_arrays([[{'data': {'v': 1}}, {'data': 'open'}], [{'data': {'v': 2}}], [{'data': 3}]])
+        self.assertEqual(columns['data'].tolist(), [None, 'open', None, 3])
+        self.assertEqual(columns['data.v'][[0, 2]].tolist(), [1, 2])
+        self.assertTrue(numpy.isnan(columns['data.v'][[1, 3]]).all())
+
+    @unittest.skipIf(columnar.numpy is None, 'numpy is not installed')
+    def test_Backfill(self):
+        from sense.backfill import Backfill
+
+        def events_page(request, uri, headers):
+            start = request.querystring['start'][0]
+            number = int(request.querystring.get('page', ['1'])[0])
+            page = deepcopy(DUMMY_EVENTS_PAGE)
+            if number == 1:
+                page['links']['next'] = sense.api_url + '/feeds/backfilluid/events/?page=2&start=' + start
+            page['objects'] = [dict(DUMMY_EVENT, dateEvent='%sT0%d:00:00' % (start[:10], 2 * number + i),
+                                    data={'value': i}) for i in range(2)]
+            return 200, headers, json.dumps(page)
+        httpretty.register_uri(httpretty.GET, sense.api_url + '/feeds/backfilluid/events/', body=events_page)
+
+        start = datetime.datetime(2014, 4, 1)
+        options = dict(start=start, end=start + datetime.timedelta(days=2), window=datetime.timedelta(days=1),
+                       # httpretty hands the callbacks of concurrent requests a shared request
+                       processes=2, fetchers=1, queue_size=2)
+        backfill = Backfill(['backfilluid'], output='events', **options)
+        pages = list(backfill)
+        self.assertEqual(len(pages), 4)
+        self.assertEqual(backfill.stats()['events'], 8)
+        self.assertEqual(pages[0][0].uid, 'backfilluid')
+        self.assertEqual(pages[0][1][0].data, {'value': 0})
+
+        columns = Backfill([sense.Feed('backfilluid')], fields=['dateEvent', 'data.value'], **options).to_arrays()
+        dates = columns['backfilluid']['dateEvent'].astype(datetime.datetime).tolist()
+        self.assertEqual(dates, sorted(dates))
+        self.assertEqual(len(dates), 8)
+        self.assertEqual(columns['backfilluid']['data.value'].tolist(), [0, 1] * 4)
+
+    def test_Event_create_encoding(self):
+        httpretty.register_uri(
+            httpretty.POST, sense.api_url + '/feeds/testuid/events/',
+            body=json.dumps(DUMMY_EVENT),
+            content_type='application/json')
+
+        data = {'value': 3.14159265358979, 'count': 2 ** 60}
+        sense.Feed('testuid').events.create(data=data)
+        self.assertEqual(json.loads(httpretty.last_request().body)['data'], data)
+        self.assertRaises(TypeError, sense.Feed('testuid').events.create, dateEvent=datetime.datetime(2014, 4, 1))
+
+    def test_Event_create_many(self):
+        httpretty.register_uri(
+            httpretty.POST, sense.api_url + '/feeds/testuid/events/',
+            body=json.dumps(DUMMY_EVENT),
+            content_type='application/json')
+
+        results = sense.Feed('testuid').events.create_many([DUMMY_EVENT, {'data': 'other'}])
+        self.assertEqual([r.ok for r in results], [True, True])
+        self.assertEqual(results[1].item, {'data': 'other'})
+
+    def test_FeedPoller(self):
+        from sense.poller import FeedPoller
+
+        def events_page(*dates):
+            page = deepcopy(DUMMY_EVENTS_PAGE)
+            page['objects'] = [dict(DUMMY_EVENT, dateEvent='2014-04-16T12:00:0%d' % d, payload=d)
+                               for d in reversed(dates)]
+            return httpretty.Response(body=json.dumps(page))
+        httpretty.register_uri(
+            httpretty.GET, sense.api_url + '/feeds/polleduid/events/',
+            responses=[events_page(1, 2), events_page(2, 3, 4), events_page(4), events_page(4)])
+
+        received = []
+        poller = FeedPoller(['polleduid'], interval=1, min_interval=0.5, max_interval=4,
+                            callback=lambda feed, event: received.append((feed.uid, event.payload)))
+        self.assertEqual(poller.run_pending(), 0)
+        self.assertEqual(poller.run_pending(), 0)
+        poller._heap[0] = (0,) + poller._heap[0][1:]
+        self.assertEqual(poller.run_pending(), 2)
+        self.assertEqual(received, [('polleduid', 3), ('polleduid', 4)])
+        self.assertEqual(httpretty.last_request().querystring['start'], ['2014-04-16T12:00:02'])
+        self.assertEqual(poller.intervals(), {'/feeds/polleduid/': 0.5})
+
+        poller._heap[0] = (0,) + poller._heap[0][1:]
+        self.assertEqual(poller.run_pending(), 0)
+        self.assertEqual(poller.intervals(), {'/feeds/polleduid/': 1.0})
+
+        # Bursts larger than a page are read from the following pages, newest first
+        latest = [2]
+        def burst_page(request, uri, headers):
+            number = int(request.querystring.get('page', ['1'])[0])
+            dates = range(latest[0], 0, -1)[(number - 1) * 2:number * 2]
+            page = deepcopy(DUMMY_EVENTS_PAGE)
+            if number * 2 < latest[0]:
+                page['links']['next'] = sense.api_url + '/feeds/burstuid/events/?page=%d' % (number + 1)
+            page['objects'] = [dict(DUMMY_EVENT, dateEvent='2014-04-16T12:00:0%d' % d, payload=d) for d in dates]
+            return 200, headers, json.dumps(page)
+        httpretty.register_uri(httpretty.GET, sense.api_url + '/feeds/burstuid/events/', body=burst_page)
+
+        received = []
+        poller = FeedPoller(['burstuid'], limit=2, callback=lambda feed, event: received.append(event.payload))
+        self.assertEqual(poller.run_pending(), 0)
+        latest[0] = 7
+        poller._heap[0] = (0,) + poller._heap[0][1:]
+        self.assertEqual(poller.run_pending(), 5)
+        self.assertEqual(received, [3, 4, 5, 6, 7])
+        self.assertEqual(httpretty.last_request().querystring['page'], ['3'])
+
+        # A failing callback gets the events it missed at the next poll
+        def deliver(feed, event):
+            if event.payload == 4 and not failed:
+                failed.append(event.payload)
+                raise ValueError(event.payload)
+            received.append(event.payload)
+        received, failed = [], []
+        latest[0] = 2
+        poller = FeedPoller(['burstuid'], limit=2, callback=deliver)
+        poller.run_pending()
+        latest[0] = 5
+        poller._heap[0] = (0,) + poller._heap[0][1:]
+        self.assertRaises(ValueError, poller.run_pending)
+        self.assertEqual(received, [3])
+        self.assertEqual(len(poller._heap), 1)
+        self.assertEqual(poller.stats()['errors'], 1)
+        self.assertEqual(poller.stats()['delivered'], 1)
+        poller._heap[0] = (0,) + poller._heap[0][1:]
+        self.assertEqual(poller.run_pending(), 2)
+        self.assertEqual(received, [3, 4, 5])
+
+        # Queued delivery from the worker threads
+        poller = FeedPoller(['polleduid'], interval=0.01, since='2014-04-16T12:00:03').start()
+        try:
+            feed, event = poller.get(timeout=2)
+        finally:
+            poller.stop()
+        self.assertEqual(event.payload, 4)
+
+    def test_EventBatcher(self):
+        httpretty.register_uri(
+            httpretty.POST, sense.api_url + '/feeds/testuid/events/',
+            body=json.dumps(DUMMY_EVENT),
+            content_type='application/json')
+        httpretty.register_uri(
+            httpretty.POST, sense.api_url + '/feeds/baduid/events/',
+            status=500)
+
+        batcher = sense.EventBatcher(max_size=3, max_delay=None)
+        self.assertIsNone(batcher.add('testuid', data=1))
+        self.assertIsNone(batcher.add(sense.Feed('baduid'), data=2))
+        self.assertEqual(len(batcher), 2)
+
+        results = batcher.add('testuid', data=3)
+        self.assertEqual(len(batcher), 0)
+        self.assertEqual(sorted((r.item['data'], r.ok) for r in results),
+                         [(1, True), (2, False), (3, True)])
+
+        flushed = []
+        with sense.EventBatcher(max_delay=0.01, callback=flushed.extend) as batcher:
+            batcher.add('testuid', data=4)
+            for _ in range(100):
+                if flushed:
+                    break
+                time.sleep(0.01)
+        self.assertEqual(len(flushed), 1)
+
     def test_nested_Feeds(self):
 
         httpretty.register_uri(
@@ -419,6 +1080,127 @@ class TestIntegration(unittest.TestCase):
         feed = node.feeds.retrieve('testtype')
         self.assertIsInstance(feed, sense.Feed)
 
+    def test_default_client(self):
+        sense.default_client = sense.Client(api_key='clientkey')
+        try:
+            sense.Node.retrieve('testuid')
+            sense.Node.retrieve('testuid')
+        finally:
+            sense.default_client = None
+        self.assertEqual(httpretty.last_request().headers.get('Authorization'), 'Token clientkey')
+
+    def test_cache(self):
+        cache = sense.LRUCache(ttl=60, ttls={'subscriptions': 0.05})
+        sense.default_client = sense.Client(cache=cache)
+        httpretty.register_uri(
+            httpretty.GET, sense.api_url + '/subscriptions/testuid/',
+            responses=[
+                httpretty.Response(body=json.dumps(DUMMY_SUBSCRIPTION), adding_headers={'ETag': '"v1"'}),
+                httpretty.Response(body='', status=304),
+            ])
+        httpretty.register_uri(
+            httpretty.DELETE, sense.api_url + '/subscriptions/testuid/',
+            body=None)
+        try:
+            for _ in range(3):
+                self.assertEqual(sense.Node.retrieve('testuid').label, 'node__dummy')
+            self.assertEqual(len(httpretty.HTTPretty.latest_requests), 1)
+            self.assertEqual(cache.stats()['hits'], 2)
+
+            s = sense.Subscription.retrieve('testuid')
+            time.sleep(0.06)
+            self.assertEqual(sense.Subscription.retrieve('testuid'), s)
+            self.assertEqual(httpretty.last_request().headers.get('If-None-Match'), '"v1"')
+            self.assertEqual(cache.stats()['revalidations'], 1)
+
+            s.delete()
+            self.assertEqual(cache.stats()['entries'], 1)
+        finally:
+            sense.default_client = None
+
+        from sense.cache import resource_type
+        self.assertEqual(resource_type('/nodes/testuid/feeds/motion/'), 'feeds')
+        self.assertEqual(resource_type('/feeds/testuid/events/?limit=3'), 'events')
+
+    def test_SQLiteCache(self):
+        import os
+        import tempfile
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            sense.default_client = sense.Client(cache=sense.SQLiteCache(path, ttl=60))
+            node = sense.Node.retrieve('testuid')
+            self.assertEqual(sense.Node.retrieve('testuid'), node)
+            self.assertEqual(len(httpretty.HTTPretty.latest_requests), 1)
+            sense.default_client.cache.close()
+
+            # A restarted process serves the stored response, then refreshes it in the background
+            cache = sense.SQLiteCache(path, ttl=0.01, max_stale=60)
+            sense.default_client = sense.Client(cache=cache)
+            time.sleep(0.02)
+            self.assertEqual(sense.Node.retrieve('testuid'), node)
+            self.assertEqual(cache.stats()['stale'], 1)
+            sense.default_client.executor.close()
+            sense.default_client.executor.join()
+            self.assertEqual(len(httpretty.HTTPretty.latest_requests), 2)
+            self.assertEqual(cache.uids('nodes'), ['testuid'])
+
+            cache.max_stale = 0
+            time.sleep(0.02)
+            sense.Node.retrieve('testuid')
+            self.assertEqual(len(httpretty.HTTPretty.latest_requests), 3)
+            cache.close()
+        finally:
+            sense.default_client = None
+            os.remove(path)
+
+    def test_throttled(self):
+        sense.default_client = sense.Client(scheduler=sense.Scheduler(backoff=0))
+        httpretty.register_uri(
+            httpretty.GET, sense.api_url + '/feeds/testuid/',
+            responses=[
+                httpretty.Response(body='', status=429, adding_headers={'Retry-After': '0'}),
+                httpretty.Response(body=json.dumps(DUMMY_FEED)),
+            ])
+        try:
+            self.assertEqual(sense.Feed.retrieve('testuid').uid, 'testuid')
+            self.assertEqual(sense.default_client.scheduler.metrics()['throttled'], 1)
+        finally:
+            sense.default_client = None
+
+    def test_hooks(self):
+        sense.default_client = client = sense.Client()
+        metrics = sense.MetricsCollector().install(client)
+        sent = []
+        client.on_request.append(sent.append)
+        httpretty.register_uri(httpretty.GET, sense.api_url + '/nodes/missing/', status=404)
+        try:
+            sense.Node.retrieve('testuid')
+            sense.Node.list()
+            self.assertRaises(requests.HTTPError, sense.Node.retrieve, 'missing')
+        finally:
+            sense.default_client = None
+
+        self.assertEqual([i['url_template'] for i in sent], ['/nodes/{uid}/', '/nodes/', '/nodes/{uid}/'])
+        node = metrics.to_dict()[1]
+        self.assertEqual((node['resource'], node['method'], node['url_template']), ('Node', 'GET', '/nodes/{uid}/'))
+        self.assertEqual(node['requests'], {'200': 1, '404': 1})
+        self.assertEqual(node['errors'], 1)
+        self.assertGreaterEqual(node['bytes'], len(json.dumps(DUMMY_NODE)))
+        self.assertEqual(sorted(node['timings']), ['decode', 'json', 'network', 'prepare'])
+        self.assertEqual(node['timings']['network']['count'], 2)
+
+        text = metrics.to_prometheus()
+        self.assertIn('sense_client_requests_total{resource="Node",method="GET",url_template="/nodes/{uid}/",status="404"} 1', text)
+        self.assertIn('le="+Inf"} 2', text)
+        self.assertIs(sent[0]['resource'], sense.Node)
+
+        # Label values are escaped
+        metrics.reset()
+        metrics({'resource': sense.Node, 'method': 'GET', 'url_template': '/a"b\\c\nd/', 'status': 200,
+                 'bytes': 0, 'timings': {}})
+        self.assertIn('url_template="/a\\"b\\\\c\\nd/"', metrics.to_prometheus())
+
     def test_nested_token(self):
         dummy_token = 'blah'
         httpretty.register_uri(
@@ -429,6 +1211,143 @@ class TestIntegration(unittest.TestCase):
         t = sense.User.api_key(username='pierre', password='********')
         self.assertEqual(t, dummy_token)
 
+    def test_NodeMirror(self):
+        from sense.sync import NodeMirror
+        api_url = 'https://sync.sen.se/api/v2'
+        nodes = {}
+
+        def nodes_page(request, uri, headers):
+            objects = sorted(nodes.values(), key=lambda n: n['updatedAt'],
+                             reverse='ordering' in request.querystring)
+            since = request.querystring.get('updatedAt__gte')
+            if since:
+                objects = [n for n in objects if n['updatedAt'] >= since[0]]
+            page = dict(PAGE, links={'next': None, 'prev': None}, totalObjects=len(objects), objects=objects)
+            return 200, headers, json.dumps(page)
+        httpretty.register_uri(httpretty.GET, api_url + '/nodes/', body=nodes_page)
+
+        # Nodes shared by an identity map are updated in place by the following passes
+        mapped = sense.Client(api_url=api_url, identity_map=True)
+        for settings in ({'api_url': api_url}, {'client': mapped}):
+            for options in ({'ordering': ('ordering', '-updatedAt')}, {'since_param': 'updatedAt__gte'}):
+                nodes.clear()
+                nodes.update((uid, dict(DUMMY_NODE, uid=uid, updatedAt='2014-07-12T12:00:0%d' % i))
+                             for i, uid in enumerate(['a', 'b', 'c']))
+                mirror = NodeMirror(full_every=3, **dict(options, **settings))
+                self.assertEqual(mirror.sync(), (set('abc'), set(), set()))
+                self.assertEqual(mirror.watermark, datetime.datetime(2014, 7, 12, 12, 0, 2))
+
+                nodes['b'] = dict(nodes['b'], label='renamed', updatedAt='2014-07-12T12:00:05')
+                nodes['d'] = dict(DUMMY_NODE, uid='d', updatedAt='2014-07-12T12:00:04')
+                del nodes['a']
+                result = mirror.sync()
+                self.assertEqual(result, (set('d'), set('b'), set()))
+                self.assertEqual(mirror['b'].label, 'renamed')
+                self.assertFalse(mirror.sync())
+                # Removals are detected by the full pass
+                self.assertEqual(mirror.sync(), (set(), set(), set('a')))
+                self.assertEqual(sorted(n.uid for n in mirror), ['b', 'c', 'd'])
+                self.assertEqual(bool(mirror._snapshots), 'client' in settings)
+
+                # Changes of the nested feeds alone
+                for uid in nodes:
+                    nodes[uid] = dict(nodes[uid], subscribes=[dict(DUMMY_NODE['subscribes'][0], label='renamed')])
+                self.assertEqual(mirror.sync(full=True), (set(), set('bcd'), set()))
+                self.assertEqual(mirror['c'].subscribes[0].label, 'renamed')
+
+    def test_fields(self):
+        nodes = list(sense.Node.all(fields=['label', 'updatedAt']))
+        self.assertEqual(len(nodes), 10)
+        for node in nodes:
+            self.assertEqual(sorted(node), ['label', 'object', 'uid', 'updatedAt'])
+            self.assertIsInstance(node.updatedAt, datetime.datetime)
+        sense.Node.list(fields=['label', 'updatedAt'])
+        self.assertEqual(httpretty.last_request().querystring['fields'], ['label,updatedAt'])
+
+        node = sense.Node.retrieve('testuid', fields='label')
+        self.assertEqual(dict(node), {'object': 'node', 'uid': 'testuid', 'label': 'node__dummy'})
+        self.assertEqual(httpretty.last_request().querystring['fields'], ['label'])
+
+    def test_ClientPool(self):
+        tenants = sense.ClientPool(max_clients=2, limits={'rate': 100})
+        first = tenants.get('first', 'secret')
+        self.assertIs(tenants.get('first', 'secret'), first)
+        self.assertIsNot(tenants.get('first'), first)
+        self.assertIs(first.session, tenants.get('other', rate=10).session)
+        self.assertEqual(first.scheduler.bucket.rate, 100)
+        self.assertEqual(tenants.get('other').scheduler.bucket.rate, 10)
+        self.assertEqual(tenants.stats(), {'clients': 2, 'hits': 2, 'misses': 3, 'evictions': 1})
+
+        # The following pages are requested through the client of the tenant
+        nodes = list(sense.Node.all(client=tenants.get('other')))
+        self.assertEqual(len(nodes), 10)
+        tenant_auth = sense.utils.token_auth('other').header.strip()
+        self.assertEqual(httpretty.last_request().headers['Authorization'], tenant_auth)
+        sense.Node.retrieve('testuid')
+        self.assertNotEqual(httpretty.last_request().headers['Authorization'], tenant_auth)
+        tenants.close()
+
+    def test_pickle_overridden_client(self):
+        import pickle
+        page = sense.Node.list(api_key='other')
+        self.assertIsNotNone(page._client)
+        for restored in (pickle.loads(pickle.dumps(page, 2)), deepcopy(page)):
+            self.assertEqual(restored, page)
+            self.assertEqual(restored._client.settings()[1], 'other')
+            # The following pages keep the credentials of the first one
+            self.assertIsNotNone(restored.next())
+            self.assertEqual(httpretty.last_request().headers['Authorization'],
+                             sense.utils.token_auth('other').header.strip())
+        self.assertIsNone(pickle.loads(pickle.dumps(sense.Node.list(), 2))._client)
+
+    def test_identity_map(self):
+        httpretty.register_uri(
+            httpretty.GET, sense.api_url + '/user/',
+            body=json.dumps(DUMMY_USER),
+            content_type='application/json')
+        sense.default_client = sense.Client(identity_map=True)
+        try:
+            nodes = list(sense.Node.all())
+            self.assertIs(nodes[0], nodes[-1])
+            self.assertIs(nodes[0].publishes[0], nodes[1].publishes[0])
+            node = sense.Node.retrieve('testuid')
+            self.assertIs(node, nodes[0])
+            self.assertIs(sense.User.retrieve().devices[0], node)
+
+            # Newer representations update the shared instance
+            httpretty.register_uri(
+                httpretty.GET, sense.api_url + '/nodes/testuid/',
+                body=json.dumps(dict(DUMMY_NODE, label='renamed')),
+                content_type='application/json')
+            self.assertIs(sense.Node.retrieve('testuid'), node)
+            self.assertEqual(node.label, 'renamed')
+
+            sense.default_client.identity_map.invalidate(sense.Node, 'testuid')
+            self.assertIsNot(sense.Node.retrieve('testuid'), node)
+            # Other credentials do not share instances
+            self.assertIsNot(sense.Node.retrieve('testuid', api_key='other'), nodes[0])
+
+            # Feeds of a node keep being addressed through it
+            motion = node.publishes[0]
+            httpretty.register_uri(
+                httpretty.GET, sense.api_url + '/nodes/testuid/feeds/motion/',
+                body=json.dumps(DUMMY_NODE['publishes'][0]))
+            self.assertIs(node.feeds.retrieve('motion'), motion)
+            self.assertEqual(motion.events._events_path(), '/nodes/testuid/feeds/motion/events/')
+
+            # Deleting with other credentials leaves the instances of the client
+            httpretty.register_uri(
+                httpretty.GET, sense.api_url + '/subscriptions/testuid/',
+                body=json.dumps(DUMMY_SUBSCRIPTION))
+            httpretty.register_uri(httpretty.DELETE, sense.api_url + '/subscriptions/testuid/', body='')
+            subscription = sense.Subscription.retrieve('testuid')
+            subscription.delete(api_key='other')
+            self.assertIs(sense.Subscription.retrieve('testuid'), subscription)
+            subscription.delete()
+            self.assertIsNot(sense.Subscription.retrieve('testuid'), subscription)
+        finally:
+            sense.default_client = None
+
 # @unittest.skip("Skipping test hitting a live server")
 class TestsIntegrationLiveServer(unittest.TestCase):
     fixtures = None